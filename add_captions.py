@@ -1,46 +1,90 @@
 import argparse
+import json
 import os
+import shutil
+import subprocess
 import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from moviepy import ColorClip, AudioFileClip
-from moviepy.video.compositing.CompositeVideoClip import CompositeVideoClip
+from moviepy.config import FFMPEG_BINARY
 
 # Add src to path for imports
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 
-from utilities.caption_processor import GenerateCaptions
-from utilities.video_processor import add_captions
+from utilities.video_processor import add_captions, get_media_duration, nvenc_available, write_ass_captions
 
-def create_captions_video(audio_path: str, output_path: str):
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".aac", ".flac", ".m4a", ".ogg")
+
+# libx264 (preset, crf) per quality level: "draft" for quick checks, "final" for delivery
+X264_QUALITY = {
+    "draft": ("ultrafast", "23"),
+    "final": ("medium", "18"),
+}
+
+def create_captions_video(audio_path: str, output_path: str, preset: str = None, cq: int = 23, caption_generator=None,
+                          whisper_device: str = None, whisper_precision: str = None, quality: str = "draft",
+                          chunk_seconds: float = None, renderer: str = "moviepy", whisper_batch_size: int = None,
+                          whisper_model: str = "medium"):
     """
     Generates a video with captions on a green background from an audio file.
 
     Args:
         audio_path (str): Path to the input audio file.
         output_path (str): Path to save the output video file.
+        preset (str): Encoder preset. Defaults to "p4" for NVENC and the quality level's preset for libx264.
+        cq (int): Constant quality level used when encoding with NVENC.
+        caption_generator (GenerateCaptions): Optional already-loaded generator to reuse.
+        whisper_device (str): "cuda" or "cpu". Defaults to CUDA when a GPU is available.
+        whisper_precision (str): Whisper compute type. Defaults to float16 on CUDA and int8 on CPU.
+        quality (str): "draft" or "final", selects the libx264 preset and CRF when NVENC is unavailable.
+        chunk_seconds (float): If set, stream the audio to Whisper in windows of this length to bound memory.
+        renderer (str): "moviepy" composites captions in Python, "ass" has ffmpeg's libass burn them in.
+        whisper_batch_size (int): If set, transcribe this many audio windows per forward pass.
+        whisper_model (str): faster-whisper model name or path, e.g. "medium" or "distil-large-v3".
+
+    Returns:
+        str: The output path on success, None otherwise.
     """
     if not os.path.exists(audio_path):
         print(f"Error: Audio file not found at {audio_path}")
         return
 
-    print("1. Loading audio and getting duration...")
-    audio_clip = AudioFileClip(audio_path)
-    video_duration = audio_clip.duration
-    print(f"   - Audio duration: {video_duration:.2f} seconds")
+    # Reading the duration and probing the encoder are independent of Whisper,
+    # so run them in the background while captions are generated
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        duration_future = executor.submit(get_media_duration, audio_path)
+        executor.submit(nvenc_available)
 
-    print("2. Generating captions...")
-    try:
-        caption_generator = GenerateCaptions(model_size="medium", device="cpu")
-        caption_data = caption_generator.generate(audio_path)
-        print(f"   - Generated {len(caption_data['captions'])} caption segments.")
-    except Exception as e:
-        print(f"Error during caption generation: {e}")
-        return
+        print("1. Generating captions...")
+        try:
+            if caption_generator is None:
+                from utilities.caption_processor import get_caption_generator
+                caption_generator = get_caption_generator(whisper_model, whisper_device, whisper_precision, whisper_batch_size)
+            print(f"   - Whisper running on {caption_generator.device} ({caption_generator.compute_type})")
+            caption_data = caption_generator.generate(audio_path, chunk_seconds=chunk_seconds)
+            print(f"   - Generated {len(caption_data['captions'])} caption segments.")
+        except Exception as e:
+            print(f"Error during caption generation: {e}")
+            return
+
+        print("2. Getting audio duration...")
+        try:
+            video_duration = duration_future.result()
+            print(f"   - Audio duration: {video_duration:.2f} seconds")
+        except Exception as e:
+            print(f"Error reading audio file: {e}")
+            return
 
     print("3. Creating green background video...")
     # Standard green screen color
     green_screen_color = [0, 255, 0]
     video_size = (1080, 1920)  # 9:16 aspect ratio for shorts
 
+    if renderer == "ass":
+        return burn_ass_captions(caption_data, audio_path, output_path, video_duration, video_size,
+                                 green_screen_color, preset=preset, cq=cq, quality=quality)
+
     background_clip = ColorClip(size=video_size, color=green_screen_color, duration=video_duration)
 
     print("4. Adding captions to the video...")
@@ -58,28 +102,207 @@ def create_captions_video(audio_path: str, output_path: str):
         return
 
     # The final clip should be a CompositeVideoClip with the background and captions
-    # The add_captions function should return a CompositeVideoClip
-    final_clip = video_with_captions
+    # The add_captions function should return a CompositeVideoClip.
+    # The audio decoder is only opened here, where the audio is actually muxed in.
+    final_clip = video_with_captions.with_audio(AudioFileClip(audio_path))
 
     print(f"5. Exporting video to {output_path}...")
     try:
-        final_clip.write_videofile(
-            output_path,
-            codec="libx264",
-            audio_codec="aac",
-            fps=30,
-            preset="medium",
-            ffmpeg_params=["-crf", "18"]
-        )
+        if nvenc_available():
+            print("   - Using NVIDIA NVENC hardware encoder")
+            final_clip.write_videofile(
+                output_path,
+                codec="h264_nvenc",
+                audio_codec="aac",
+                fps=30,
+                preset=preset or "p4",
+                ffmpeg_params=["-tune", "hq", "-rc", "vbr", "-cq", str(cq), "-b:v", "0", "-movflags", "+faststart"],
+                logger=None
+            )
+        else:
+            x264_preset, crf = X264_QUALITY[quality]
+            final_clip.write_videofile(
+                output_path,
+                codec="libx264",
+                audio_codec="aac",
+                fps=30,
+                preset=preset or x264_preset,
+                threads=os.cpu_count(),
+                ffmpeg_params=["-crf", crf, "-movflags", "+faststart"],
+                logger=None
+            )
         print("   - Video exported successfully!")
+        return output_path
     except Exception as e:
         print(f"Error exporting video: {e}")
 
+def burn_ass_captions(caption_data: dict, audio_path: str, output_path: str, duration: float, video_size: tuple,
+                      background_color: list, preset: str = None, cq: int = 23, quality: str = "draft"):
+    """
+    Renders the captions video in a single ffmpeg call: a lavfi colour source,
+    the captions as an ASS file burned in by libass, and the audio muxed in.
+    No frames pass through Python.
+
+    Returns:
+        str: The output path on success, None otherwise.
+    """
+    print("4. Writing captions as ASS subtitles...")
+    with tempfile.TemporaryDirectory() as work_dir:
+        try:
+            font_file = write_ass_captions(
+                os.path.join(work_dir, "captions.ass"),
+                texts=caption_data['captions'],
+                start_times=caption_data['start_times'],
+                durations=caption_data['durations'],
+                video_size=video_size,
+                color="white"
+            )
+            # ffmpeg runs inside work_dir so the filter arguments need no path escaping
+            if font_file:
+                shutil.copy(font_file, work_dir)
+        except Exception as e:
+            print(f"Error writing ASS captions: {e}")
+            return
+
+        if nvenc_available():
+            print("   - Using NVIDIA NVENC hardware encoder")
+            video_args = ["-c:v", "h264_nvenc", "-preset", preset or "p4",
+                          "-tune", "hq", "-rc", "vbr", "-cq", str(cq), "-b:v", "0"]
+        else:
+            x264_preset, crf = X264_QUALITY[quality]
+            video_args = ["-c:v", "libx264", "-preset", preset or x264_preset,
+                          "-crf", crf, "-threads", str(os.cpu_count() or 0)]
+
+        r, g, b = background_color
+        width, height = video_size
+        command = [
+            FFMPEG_BINARY, "-y", "-hide_banner", "-loglevel", "error",
+            "-f", "lavfi", "-i", f"color=c=0x{r:02X}{g:02X}{b:02X}:s={width}x{height}:r=30:d={duration:.3f}",
+            "-i", os.path.abspath(audio_path),
+            "-map", "0:v", "-map", "1:a",
+            "-vf", "ass=captions.ass:fontsdir=.",
+            *video_args,
+            "-pix_fmt", "yuv420p", "-c:a", "aac", "-movflags", "+faststart", "-shortest",
+            os.path.abspath(output_path),
+        ]
+
+        print(f"5. Exporting video to {output_path}...")
+        result = subprocess.run(command, cwd=work_dir, capture_output=True)
+        if result.returncode != 0:
+            print(f"Error exporting video: {result.stderr.decode(errors='replace').strip()}")
+            return
+
+    print("   - Video exported successfully!")
+    return output_path
+
+def load_batch_jobs(batch_path: str) -> list:
+    """
+    Builds a list of (audio_path, output_path) pairs from a directory or JSON manifest.
+
+    A directory yields one job per audio file, written next to it as "<name>_captions.mp4".
+    A manifest is a JSON list of [audio_path, output_path] pairs or
+    {"audio_path": ..., "output_path": ...} objects; anything else raises ValueError.
+    """
+    if os.path.isdir(batch_path):
+        jobs = []
+        for file_name in sorted(os.listdir(batch_path)):
+            name, ext = os.path.splitext(file_name)
+            if ext.lower() in AUDIO_EXTENSIONS:
+                jobs.append((os.path.join(batch_path, file_name),
+                             os.path.join(batch_path, f"{name}_captions.mp4")))
+        return jobs
+
+    with open(batch_path) as f:
+        manifest = json.load(f)
+    if not isinstance(manifest, list):
+        raise ValueError(f"{batch_path}: the manifest must be a JSON list of jobs")
+
+    jobs = []
+    for index, entry in enumerate(manifest):
+        if isinstance(entry, dict) and "audio_path" in entry and "output_path" in entry:
+            pair = (entry["audio_path"], entry["output_path"])
+        elif isinstance(entry, list) and len(entry) == 2:
+            pair = tuple(entry)
+        else:
+            raise ValueError(f"{batch_path}: entry {index} must be an [audio_path, output_path] pair "
+                             f"or an object with both keys, got {entry!r}")
+        if not all(isinstance(path, str) and path for path in pair):
+            raise ValueError(f"{batch_path}: entry {index} must give both paths as non-empty strings, got {entry!r}")
+        jobs.append(pair)
+    return jobs
+
+def create_captions_videos(jobs: list, preset: str = None, cq: int = 23, max_workers: int = 3,
+                           whisper_device: str = None, whisper_precision: str = None, quality: str = "draft",
+                           chunk_seconds: float = None, renderer: str = "moviepy", whisper_batch_size: int = None,
+                           whisper_model: str = "medium") -> list:
+    """
+    Generates captions videos for many (audio_path, output_path) pairs.
+
+    The Whisper model is loaded once and shared by every job, and exports run
+    concurrently so several ffmpeg/NVENC sessions stay busy instead of paying
+    start-up costs one video at a time.
+
+    Returns:
+        list: Output paths of the videos that were created successfully.
+    """
+    if not jobs:
+        print("No jobs to process")
+        return []
+
+    print(f"Loading caption model for {len(jobs)} jobs...")
+    from utilities.caption_processor import get_caption_generator
+    caption_generator = get_caption_generator(whisper_model, whisper_device, whisper_precision, whisper_batch_size)
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = [
+            executor.submit(create_captions_video, audio_path, output_path,
+                            preset=preset, cq=cq, caption_generator=caption_generator, quality=quality,
+                            chunk_seconds=chunk_seconds, renderer=renderer)
+            for audio_path, output_path in jobs
+        ]
+        results = [future.result() for future in futures]
+
+    created = [path for path in results if path]
+    print(f"Created {len(created)} of {len(jobs)} videos")
+    return created
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Generate a captions video on a green screen from an audio file.")
-    parser.add_argument("audio_path", type=str, help="Path to the input audio file.")
-    parser.add_argument("output_path", type=str, help="Path to save the output MP4 video.")
+    parser.add_argument("audio_path", type=str, nargs="?", help="Path to the input audio file.")
+    parser.add_argument("output_path", type=str, nargs="?", help="Path to save the output MP4 video.")
+    parser.add_argument("--batch", type=str, default=None, help="Directory of audio files or JSON manifest of (audio_path, output_path) pairs.")
+    parser.add_argument("--workers", type=int, default=3, help="Number of videos exported concurrently in batch mode.")
+    parser.add_argument("--preset", type=str, default=None, help="Encoder preset (default: p4 for NVENC, set by --quality for libx264).")
+    parser.add_argument("--quality", type=str, default="draft", choices=sorted(X264_QUALITY), help="libx264 fallback quality: draft (ultrafast, crf 23) or final (medium, crf 18).")
+    parser.add_argument("--cq", type=int, default=23, help="NVENC constant quality level (lower is better quality).")
+    parser.add_argument("--whisper-device", type=str, default=None, choices=["cuda", "cpu"], help="Device for caption generation (default: cuda when available).")
+    parser.add_argument("--chunk-seconds", type=float, default=None, help="Stream audio to Whisper in windows of this many seconds (e.g. 30) to keep memory flat on long recordings.")
+    parser.add_argument("--renderer", type=str, default="moviepy", choices=["moviepy", "ass"], help="Caption renderer: moviepy compositing or ffmpeg/libass burn-in of an ASS file (much faster).")
+    parser.add_argument("--whisper-precision", type=str, default=None, help="Whisper compute type, e.g. float16, int8_float16, int8 (default: float16 on cuda, int8 on cpu).")
+    parser.add_argument("--whisper-model", type=str, default="medium", help="faster-whisper model name or path; distil-large-v3 decodes several times faster than medium on English speech.")
+    parser.add_argument("--prepare-model", nargs=2, metavar=("HF_MODEL", "OUTPUT_DIR"), default=None, help="Convert a Hugging Face Whisper checkpoint (e.g. openai/whisper-medium) to a pre-quantized CTranslate2 model in OUTPUT_DIR (quantization from --whisper-precision, default int8), then exit; pass OUTPUT_DIR to --whisper-model afterwards. Needs transformers.")
+    parser.add_argument("--whisper-batch-size", type=int, default=None, help="Transcribe this many 30 s windows per forward pass (e.g. 8; mostly helps on GPU).")
     
     args = parser.parse_args()
 
-    create_captions_video(args.audio_path, args.output_path)
+    if args.prepare_model:
+        from utilities.caption_processor import prepare_model
+        model_name, output_dir = args.prepare_model
+        print(f"Converting {model_name} to {output_dir}...")
+        print(f"Model ready: use --whisper-model {prepare_model(model_name, output_dir, args.whisper_precision or 'int8')}")
+    elif args.batch:
+        try:
+            jobs = load_batch_jobs(args.batch)
+        except (OSError, ValueError) as e:
+            parser.error(f"could not read --batch: {e}")
+        create_captions_videos(jobs, preset=args.preset, cq=args.cq, max_workers=args.workers,
+                               whisper_device=args.whisper_device, whisper_precision=args.whisper_precision,
+                               quality=args.quality, chunk_seconds=args.chunk_seconds, renderer=args.renderer,
+                               whisper_batch_size=args.whisper_batch_size, whisper_model=args.whisper_model)
+    elif args.audio_path and args.output_path:
+        create_captions_video(args.audio_path, args.output_path, preset=args.preset, cq=args.cq,
+                              whisper_device=args.whisper_device, whisper_precision=args.whisper_precision,
+                              quality=args.quality, chunk_seconds=args.chunk_seconds, renderer=args.renderer,
+                              whisper_batch_size=args.whisper_batch_size, whisper_model=args.whisper_model)
+    else:
+        parser.error("audio_path and output_path are required unless --batch is given")
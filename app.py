@@ -1,174 +1,185 @@
 import gradio as gr
+import hashlib
+import importlib.util
+import json
 import os
+import subprocess
 import sys
-from typing import List, Dict, Any, Tuple, Optional
-import json
-import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 # Add src to path for imports
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 
-# Import audio processing functions directly
-import uuid
-from pydub import AudioSegment
-from pydub.silence import split_on_silence
-import re 
-
-def clean_file_name(file_path):
-    # Get the base file name and extension
-    file_name = os.path.basename(file_path)
-    file_name, file_extension = os.path.splitext(file_name)
-
-    # Replace non-alphanumeric characters with an underscore
-    cleaned = re.sub(r'[^a-zA-Z\d]+', '_', file_name)
-
-    # Remove any multiple underscores
-    clean_file_name = re.sub(r'_+', '_', cleaned).strip('_')
+# Use absolute path to ensure BGM file is found
+DEFAULT_BGM_PATH = os.path.join(os.path.dirname(__file__), "testing_stuff", "bg.mp3")
 
-    # Generate a random UUID for uniqueness
-    random_uuid = uuid.uuid4().hex[:6]
+# Output frame size for shorts (9:16)
+SHORTS_SIZE = (1080, 1920)
 
-    # Combine cleaned file name with the original extension
-    clean_file_path = os.path.join(os.path.dirname(file_path), clean_file_name + f"_{random_uuid}" + file_extension)
+# Export settings per quality level: (NVENC preset, NVENC cq, libx264 preset, libx264 crf)
+EXPORT_QUALITY = {
+    "Final": ("p4", "20", "medium", "18"),
+    "Preview": ("p1", "23", "fast", "22"),
+}
 
-    return clean_file_path
+# Cleaned-audio results remembered by process_audio_simple
+PROCESSED_AUDIO_CACHE_SIZE = 16
 
-def remove_silence(file_path, minimum_silence=50):
-    sound = AudioSegment.from_file(file_path)  # auto-detects format
-    audio_chunks = split_on_silence(sound,
-                                    min_silence_len=100,
-                                    silence_thresh=-45,
-                                    keep_silence=minimum_silence) 
-    combined = AudioSegment.empty()
-    for chunk in audio_chunks:
-        combined += chunk
-    output_path = clean_file_name(file_path)        
-    combined.export(output_path)  # format inferred from output file extension
-    return output_path
+# Space left around image overlays, in percent of the frame
+IMAGE_OVERLAY_PADDING = 10
 
-def calculate_duration(file_path):
-    audio = AudioSegment.from_file(file_path)
-    duration_seconds = len(audio) / 1000.0  # pydub uses milliseconds
-    return duration_seconds
+def add_image_overlay_with_animation(video, image_path: str, start_time: float, end_time: float, padding: int = IMAGE_OVERLAY_PADDING):
+    """
+    Build an image overlay clip with smooth up/down animation like in video_processor.py.
 
-def process_audio(audio_file, seconds=0.05):
-    keep_silence = int(seconds * 1000)
-    output_audio_file = remove_silence(audio_file, minimum_silence=keep_silence)
-    before = calculate_duration(audio_file)
-    after = calculate_duration(output_audio_file)
-    text = f"Old Duration: {before:.3f} seconds \nNew Duration: {after:.3f} seconds"
-    return output_audio_file, output_audio_file, text
-
-def add_image_overlay_with_animation(video, image_path: str, start_time: float, end_time: float, padding: int = 10):
-    """Add image overlay with smooth up/down animation like in video_processor.py"""
+    Returns the positioned ImageClip (or None on failure) so callers can composite
+    all overlays onto the video in a single composite.
+    """
     try:
+        from src.utilities.video_processor import image_overlay_clip
+        
         if not os.path.exists(image_path):
             print(f"Warning: Image file {image_path} not found")
-            return video
+            return None
             
-        video_width, video_height = video.size
-        
-        max_width = video_width * (1 - padding / 100)
-        max_height = video_height * (1 - padding / 100)
-        
-        image = ImageClip(image_path)
-        
-        img_width, img_height = image.size
-        scale_width = max_width / img_width
-        scale_height = max_height / img_height
-        scale = min(scale_width, scale_height)
-        
-        new_width = int(img_width * scale)
-        new_height = int(img_height * scale)
-        image = image.resized((new_width, new_height))
-        
-        duration = end_time - start_time
-        image = image.with_duration(duration).with_start(start_time)
-
-        center_x = (video_width - new_width) // 2
-        center_y = (video_height - new_height) // 2
-        bottom_y = video_height
-
-        transition_duration = min(0.5, duration / 3)
-
-        def position_function(t):
-            """Calculate position based on time with smooth animation"""
-            if t < transition_duration:
-                # Coming up from bottom
-                progress = t / transition_duration
-                progress = 1 - (1 - progress) ** 2  # Ease out
-                y = bottom_y - (bottom_y - center_y) * progress
-                return (center_x, y)
-            elif t > (duration - transition_duration):
-                # Going down to bottom
-                progress = (t - (duration - transition_duration)) / transition_duration
-                progress = progress ** 2  # Ease in
-                y = center_y + (bottom_y - center_y) * progress
-                return (center_x, y)
-            else:
-                # Stay in center
-                return (center_x, center_y)
-        
-        image = image.with_position(position_function)
-        
-        final_video = CompositeVideoClip([video, image])
+        # Scaled once with Pillow, so no resize filter runs on every frame
+        image = image_overlay_clip(video, image_path, start_time, end_time, padding)
         print(f"Added animated image: {os.path.basename(image_path)}")
         
-        return final_video
+        return image
         
     except Exception as e:
         print(f"Error in add_image_overlay_with_animation: {e}")
-        return video
-
-try:
-    from src.utilities.video_processor import (
-        add_primary_secondary_videos, 
-        add_image_overlay, 
-        add_captions, 
-        add_heading, 
-        add_smaller_captions
-    )
-    from moviepy import VideoFileClip, AudioFileClip, ImageClip, CompositeVideoClip
-    VIDEO_PROCESSING_AVAILABLE = True
-except ImportError as e:
-    print(f"Warning: Video processing not available: {e}")
-    VIDEO_PROCESSING_AVAILABLE = False
-    
-    # Mock functions for when video processing is not available
-    def add_primary_secondary_videos(*args, **kwargs):
-        return None
-    def add_image_overlay(*args, **kwargs):
-        return None
-    def add_captions(*args, **kwargs):
-        return None
-    def add_heading(*args, **kwargs):
-        return None
-    def add_smaller_captions(*args, **kwargs):
         return None
 
+# moviepy, pydub and the processing modules are imported where they are used, so the
+# UI comes up without paying for them; here we only check that they can be imported
+VIDEO_PROCESSING_AVAILABLE = importlib.util.find_spec("moviepy") is not None
+if not VIDEO_PROCESSING_AVAILABLE:
+    print("Warning: Video processing not available: moviepy is not installed")
+
+def _process_audio_in_worker(audio_file, silence_seconds):
+    """Silence removal in a separate interpreter, so the numeric work runs outside the server's GIL"""
+    # `python -m` on the audio module itself: the worker never imports this app or gradio
+    command = [sys.executable, "-m", "src.utilities.audio_processor",
+               os.path.abspath(audio_file), str(silence_seconds)]
+    for _ in range(2):
+        result = subprocess.run(command, cwd=os.path.dirname(os.path.abspath(__file__)),
+                                capture_output=True, text=True)
+        if result.returncode >= 0:
+            break
+        # Killed by a signal (e.g. out of memory): give a fresh worker one more try
+        print(f"Warning: audio worker was killed (signal {-result.returncode}), retrying")
+    if result.returncode != 0:
+        error_lines = result.stderr.strip().splitlines()
+        raise RuntimeError(error_lines[-1] if error_lines else f"audio worker exited with code {result.returncode}")
+    return tuple(json.loads(result.stdout.splitlines()[-1]))
+
+def _file_digest(file_path, chunk_size=1 << 20):
+    """Content hash of a file, so re-uploads of the same audio are recognised under any path"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
 class UltimateShortEditor:
     def __init__(self):
         self.audio_file = None
         self.primary_video = None
         self.secondary_video = None
         self.heading_text = ""
-        self.images_data = []
-        self.texts_data = []
+        # Overlays keyed by id; ids keep counting up so they stay unique after removals
+        self.images_data = {}
+        self.texts_data = {}
+        self._next_image_id = 0
+        self._next_text_id = 0
         self.processed_audio = None
         self.auto_captions = None
-        
-    def add_bgm_to_audio(self, main_audio_clip, bgm_path=None, bgm_volume=0.5):
-        """Add background music to the main audio clip"""
+        self._captions_source = None  # processed audio that auto_captions were generated from
+        # (audio content hash, silence_seconds) -> process_audio result, least recently used first
+        self._processed_audio_cache = OrderedDict()
+        # Opened clips and their metadata, kept so generation doesn't re-probe the files
+        self._primary_clip = None
+        self._primary_meta = None
+        self._secondary_clip = None
+        self._secondary_meta = None
+        # Renders share the cached clips, so a replaced clip is only closed once no render is running
+        self._clip_lock = threading.Lock()
+        self._renders_in_progress = 0
+        self._retired_clips = []
+        
+    def _open_video(self, video_file):
+        """
+        Open a video once, filled and centre-cropped to the shorts frame, and return the
+        clip with the source's duration, size and fps. ffmpeg scales while decoding, so
+        every later composite works on 1080x1920 frames instead of the source resolution.
+        """
+        from moviepy import VideoFileClip
+        from src.utilities.video_processor import probe_media
+        
+        infos = probe_media(video_file)
+        width, height = infos['video_size']
+        if abs(infos.get('video_rotation', 0)) in (90, 270):
+            width, height = height, width
+        meta = {'duration': infos['duration'], 'size': [width, height], 'fps': infos['video_fps']}
+        
+        target_width, target_height = SHORTS_SIZE
+        if (width, height) == SHORTS_SIZE:
+            video_clip = VideoFileClip(video_file)
+        else:
+            scale = max(target_width / width, target_height / height)
+            scaled_size = (max(target_width, round(width * scale)), max(target_height, round(height * scale)))
+            video_clip = VideoFileClip(video_file, target_resolution=scaled_size).cropped(
+                x_center=scaled_size[0] / 2,
+                y_center=scaled_size[1] / 2,
+                width=target_width,
+                height=target_height
+            )
+        return video_clip, meta
+        
+    def _store_video_clip(self, slot, video_file, clip, meta, only_if_missing=False):
+        """
+        Cache an opened clip as the 'primary' or 'secondary' video. The clip it replaces (or
+        `clip` itself, when only_if_missing and the slot was filled or changed meanwhile)
+        is retired and closed once no render is using it.
+        """
+        with self._clip_lock:
+            current_file = getattr(self, f'{slot}_video')
+            current_clip = getattr(self, f'_{slot}_clip')
+            if only_if_missing and (current_clip is not None or current_file != video_file):
+                if clip is not None:
+                    self._retired_clips.append(clip)
+            else:
+                if current_clip is not None:
+                    self._retired_clips.append(current_clip)
+                setattr(self, f'{slot}_video', video_file)
+                setattr(self, f'_{slot}_clip', clip)
+                setattr(self, f'_{slot}_meta', meta)
+            self._close_retired_clips()
+    
+    def _close_retired_clips(self):
+        """Close replaced clips if no render is running; call with _clip_lock held"""
+        if self._renders_in_progress == 0:
+            for clip in self._retired_clips:
+                clip.close()
+            self._retired_clips = []
+    
+    def add_bgm_to_audio(self, main_audio_clip, bgm_path=None, bgm_volume=0.5, bgm_clip=None):
+        """Add background music to the main audio clip, optionally from an already opened bgm_clip"""
         if bgm_path is None:
-            # Use absolute path to ensure BGM file is found
-            bgm_path = os.path.join(os.path.dirname(__file__), "testing_stuff", "bg.mp3")
+            bgm_path = DEFAULT_BGM_PATH
         
         try:
             print(f"Looking for BGM file at: {bgm_path}")
-            if os.path.exists(bgm_path):
+            if bgm_clip is not None or os.path.exists(bgm_path):
                 print(f"Adding BGM from: {bgm_path}")
-                bgm_clip = AudioFileClip(bgm_path)
+                if bgm_clip is None:
+                    from moviepy import AudioFileClip
+                    bgm_clip = AudioFileClip(bgm_path)
                 
                 # Loop BGM to match main audio duration
                 main_duration = main_audio_clip.duration
@@ -195,14 +206,9 @@ class UltimateShortEditor:
                 
                 # Reduce BGM volume and mix with main audio
                 try:
-                    # Manual volume adjustment using audio transformation
-                    def adjust_volume(clip, volume_factor):
-                        """Manually adjust volume by scaling audio data"""
-                        return clip.transform(lambda gf, t: volume_factor * gf(t))
-                    
-                    bgm_clip = adjust_volume(bgm_clip, bgm_volume)
-                    main_audio_clip = adjust_volume(main_audio_clip, 0.8)
-                    print(f"Volume adjusted using manual scaling")
+                    bgm_clip = bgm_clip.with_volume_scaled(bgm_volume)
+                    main_audio_clip = main_audio_clip.with_volume_scaled(0.8)
+                    print(f"Volume adjusted: BGM x{bgm_volume}, voice x0.8")
                     
                 except Exception as volume_error:
                     print(f"Volume adjustment failed: {volume_error}")
@@ -243,9 +249,30 @@ class UltimateShortEditor:
             print(f"Processing audio: {audio_file}")
             print(f"Keep silence: {silence_seconds}s")
             
-            # Use the working process_audio function
-            output_file, download_file, duration_text = process_audio(audio_file, silence_seconds)
-            
+            # Same audio with the same setting: reuse the cleaned file if it is still there
+            cache_key = (_file_digest(audio_file), silence_seconds)
+            cached = self._processed_audio_cache.get(cache_key)
+            reused = cached is not None and os.path.exists(cached[0])
+            if cached is not None and not reused:
+                # The cleaned file was deleted since: forget it and process again
+                del self._processed_audio_cache[cache_key]
+            if reused:
+                print("Reusing previously processed audio")
+                self._processed_audio_cache.move_to_end(cache_key)
+                output_file, download_file, duration_text = cached
+            else:
+                # Use the working process_audio function, in a worker process so the
+                # server stays responsive while it runs
+                output_file, download_file, duration_text = _process_audio_in_worker(audio_file, silence_seconds)
+                self._processed_audio_cache[cache_key] = (output_file, download_file, duration_text)
+                self._processed_audio_cache.move_to_end(cache_key)
+                while len(self._processed_audio_cache) > PROCESSED_AUDIO_CACHE_SIZE:
+                    self._processed_audio_cache.popitem(last=False)
+            
+            if not (reused and output_file == self.processed_audio):
+                # Captions belong to the previous audio
+                self.auto_captions = None
+                self._captions_source = None
             self.processed_audio = output_file
             self.audio_file = audio_file
             
@@ -262,34 +289,38 @@ class UltimateShortEditor:
     def add_primary_video(self, video_file):
         """Add primary video"""
         if video_file is not None:
-            self.primary_video = video_file
             if VIDEO_PROCESSING_AVAILABLE:
                 try:
-                    video_clip = VideoFileClip(video_file)
-                    duration = video_clip.duration
-                    size = video_clip.size
-                    fps = video_clip.fps
-                    video_clip.close()
-                    return f"✅ Primary video loaded: {os.path.basename(video_file)}\nDuration: {duration:.1f}s, Size: {size[0]}x{size[1]}, FPS: {fps:.1f}"
+                    clip, meta = self._open_video(video_file)
                 except Exception as e:
+                    # Generation opens the file itself if it can
+                    self._store_video_clip('primary', video_file, None, None)
                     return f"⚠️ Video loaded but couldn't read info: {str(e)}"
+                self._store_video_clip('primary', video_file, clip, meta)
+                duration = meta['duration']
+                size = meta['size']
+                fps = meta['fps']
+                return f"✅ Primary video loaded: {os.path.basename(video_file)}\nDuration: {duration:.1f}s, Size: {size[0]}x{size[1]}, FPS: {fps:.1f}"
+            self.primary_video = video_file
             return f"✅ Primary video loaded: {os.path.basename(video_file)}"
         return "❌ No video file provided"
     
     def add_secondary_video(self, video_file):
         """Add secondary video"""
         if video_file is not None:
-            self.secondary_video = video_file
             if VIDEO_PROCESSING_AVAILABLE:
                 try:
-                    video_clip = VideoFileClip(video_file)
-                    duration = video_clip.duration
-                    size = video_clip.size
-                    fps = video_clip.fps
-                    video_clip.close()
-                    return f"✅ Secondary video loaded: {os.path.basename(video_file)}\nDuration: {duration:.1f}s, Size: {size[0]}x{size[1]}, FPS: {fps:.1f}"
+                    clip, meta = self._open_video(video_file)
                 except Exception as e:
+                    # Generation opens the file itself if it can
+                    self._store_video_clip('secondary', video_file, None, None)
                     return f"⚠️ Video loaded but couldn't read info: {str(e)}"
+                self._store_video_clip('secondary', video_file, clip, meta)
+                duration = meta['duration']
+                size = meta['size']
+                fps = meta['fps']
+                return f"✅ Secondary video loaded: {os.path.basename(video_file)}\nDuration: {duration:.1f}s, Size: {size[0]}x{size[1]}, FPS: {fps:.1f}"
+            self.secondary_video = video_file
             return f"✅ Secondary video loaded: {os.path.basename(video_file)}"
         return "❌ No video file provided"
     
@@ -307,19 +338,22 @@ class UltimateShortEditor:
             return self.get_images_display()
         
         image_data = {
-            'id': len(self.images_data),
+            'id': self._next_image_id,
             'path': image_file,
             'start_time': start_time,
             'end_time': end_time,
             'duration': end_time - start_time
         }
         
-        self.images_data.append(image_data)
+        self.images_data[image_data['id']] = image_data
+        self._next_image_id += 1
         return self.get_images_display()
     
     def remove_image(self, image_id):
         """Remove image by ID"""
-        self.images_data = [img for img in self.images_data if img['id'] != image_id]
+        if image_id is None:
+            return "⚠️ Enter the ID of the image to remove\n\n" + self.get_images_display()
+        self.images_data.pop(int(image_id), None)
         return self.get_images_display()
     
     def get_images_display(self):
@@ -327,11 +361,10 @@ class UltimateShortEditor:
         if not self.images_data:
             return "No images added yet"
         
-        display_text = "**Added Images:**\n\n"
-        for img in self.images_data:
-            display_text += f"• **ID {img['id']}**: {os.path.basename(img['path'])} ({img['start_time']}s - {img['end_time']}s)\n"
-        
-        return display_text
+        return "**Added Images:**\n\n" + "".join(
+            f"• **ID {img['id']}**: {os.path.basename(img['path'])} ({img['start_time']}s - {img['end_time']}s)\n"
+            for img in self.images_data.values()
+        )
     
     def add_text(self, text_content, start_time, end_time):
         """Add text with timing"""
@@ -339,19 +372,22 @@ class UltimateShortEditor:
             return self.get_texts_display()
         
         text_data = {
-            'id': len(self.texts_data),
+            'id': self._next_text_id,
             'content': text_content,
             'start_time': start_time,
             'end_time': end_time,
             'duration': end_time - start_time
         }
         
-        self.texts_data.append(text_data)
+        self.texts_data[text_data['id']] = text_data
+        self._next_text_id += 1
         return self.get_texts_display()
     
     def remove_text(self, text_id):
         """Remove text by ID"""
-        self.texts_data = [txt for txt in self.texts_data if txt['id'] != text_id]
+        if text_id is None:
+            return "⚠️ Enter the ID of the text to remove\n\n" + self.get_texts_display()
+        self.texts_data.pop(int(text_id), None)
         return self.get_texts_display()
     
     def get_texts_display(self):
@@ -359,11 +395,10 @@ class UltimateShortEditor:
         if not self.texts_data:
             return "No texts added yet"
         
-        display_text = "**Added Texts:**\n\n"
-        for txt in self.texts_data:
-            display_text += f"• **ID {txt['id']}**: '{txt['content'][:50]}...' ({txt['start_time']}s - {txt['end_time']}s)\n"
-        
-        return display_text
+        return "**Added Texts:**\n\n" + "".join(
+            f"• **ID {txt['id']}**: '{txt['content'][:50]}...' ({txt['start_time']}s - {txt['end_time']}s)\n"
+            for txt in self.texts_data.values()
+        )
     
     def generate_auto_captions(self):
         """Generate automatic captions and auto-generate video if ready"""
@@ -373,23 +408,26 @@ class UltimateShortEditor:
             
             # Try to import caption processor
             try:
-                from src.utilities.caption_processor import GenerateCaptions
+                from src.utilities.caption_processor import get_caption_generator
             except ImportError:
                 return "❌ Caption generation not available. Install required dependencies.", "", None, "❌ Caption generation failed"
             
             print("Generating auto captions...")
-            caption_generator = GenerateCaptions(model_size="medium", device="cpu")
+            # Shared model: GPU with float16 when available, int8 on CPU otherwise
+            caption_generator = get_caption_generator("medium")
             caption_data = caption_generator.generate(self.processed_audio)
             
             self.auto_captions = caption_data
+            self._captions_source = self.processed_audio
             
             # Create preview text
-            preview_text = "Generated Captions:\n\n"
-            for i, (text, start_time) in enumerate(zip(caption_data['captions'][:20], caption_data['start_times'][:20])):
-                preview_text += f"{start_time:.1f}s: {text}\n"
-            
+            preview_lines = [
+                f"{start_time:.1f}s: {text}\n"
+                for text, start_time in zip(caption_data['captions'][:20], caption_data['start_times'][:20])
+            ]
             if len(caption_data['captions']) > 20:
-                preview_text += f"\n... and {len(caption_data['captions']) - 20} more captions"
+                preview_lines.append(f"\n... and {len(caption_data['captions']) - 20} more captions")
+            preview_text = "Generated Captions:\n\n" + "".join(preview_lines)
             
             status_text = f"✅ Generated {len(caption_data['captions'])} captions successfully!"
             
@@ -411,8 +449,37 @@ class UltimateShortEditor:
         
         return "✅ Auto captions cleared", "", video_output, generation_status
     
-    def generate_final_video_simple(self):
+    def _generate_video_captions(self):
+        """Transcribe the processed audio into self.auto_captions for the final video"""
+        if self.auto_captions is not None and self._captions_source == self.processed_audio:
+            print(f"Reusing {len(self.auto_captions['captions'])} captions already generated for this audio")
+            return
+        
+        print("Auto-generating captions...")
+        try:
+            from src.utilities.caption_processor import get_caption_generator
+            caption_generator = get_caption_generator("medium")
+            self.auto_captions = caption_generator.generate(self.processed_audio)
+            self._captions_source = self.processed_audio
+            print(f"Generated {len(self.auto_captions['captions'])} captions")
+        except Exception as e:
+            print(f"Caption generation failed: {e}")
+            self.auto_captions = None
+            self._captions_source = None
+    
+    def generate_final_video_simple(self, export_quality="Final"):
         """Generate final video using the simple step-by-step method with auto captions"""
+        # While a render runs, replaced clips are kept open instead of being closed under it
+        with self._clip_lock:
+            self._renders_in_progress += 1
+        try:
+            return self._generate_final_video(export_quality)
+        finally:
+            with self._clip_lock:
+                self._renders_in_progress -= 1
+                self._close_retired_clips()
+    
+    def _generate_final_video(self, export_quality):
         try:
             if not VIDEO_PROCESSING_AVAILABLE:
                 return None, "❌ Error: Video processing libraries not available"
@@ -423,30 +490,67 @@ class UltimateShortEditor:
             if not self.processed_audio:
                 return None, "❌ Error: No processed audio available. Please process audio first."
             
+            from moviepy import AudioFileClip, vfx
+            from src.utilities.video_processor import (
+                add_captions,
+                add_heading,
+                add_smaller_captions,
+                composite_over,
+                nvenc_available,
+                prepare_image_overlay
+            )
+            
             print("Starting video generation...")
             
-            # Step 1: Auto-generate captions first
-            print("Auto-generating captions...")
-            try:
-                from src.utilities.caption_processor import GenerateCaptions
-                caption_generator = GenerateCaptions(model_size="medium", device="cpu")
-                self.auto_captions = caption_generator.generate(self.processed_audio)
-                print(f"Generated {len(self.auto_captions['captions'])} captions")
-            except Exception as e:
-                print(f"Caption generation failed: {e}")
-                self.auto_captions = None
+            # Snapshot the overlays and heading: their handlers run outside the queue and
+            # may change them while this render is in progress
+            image_overlays = list(self.images_data.values())
+            text_overlays = list(self.texts_data.values())
+            heading_text = self.heading_text
+            # Same for the videos: this render keeps using the clips it started with
+            with self._clip_lock:
+                primary_file, primary_video = self.primary_video, self._primary_clip
+                secondary_file, secondary_video = self.secondary_video, self._secondary_clip
+            
+            # Step 1: Auto-generate captions while the clips are opened. Whisper and the
+            # ffmpeg probes release the GIL, so the file opens hide behind transcription.
+            with ThreadPoolExecutor(max_workers=4 + len(image_overlays)) as executor:
+                captions_future = executor.submit(self._generate_video_captions)
+                audio_future = executor.submit(AudioFileClip, self.processed_audio)
+                primary_future = None
+                if primary_video is None:
+                    primary_future = executor.submit(self._open_video, primary_file)
+                secondary_future = None
+                if secondary_file and secondary_video is None:
+                    secondary_future = executor.submit(self._open_video, secondary_file)
+                bgm_future = None
+                if os.path.exists(DEFAULT_BGM_PATH):
+                    bgm_future = executor.submit(AudioFileClip, DEFAULT_BGM_PATH)
+                
+                # Load clips like in the working video_processor.py example
+                if primary_future is not None:
+                    primary_video, primary_meta = primary_future.result()
+                    self._store_video_clip('primary', primary_file, primary_video, primary_meta, only_if_missing=True)
+                
+                # Overlay images only depend on the video size, so decode and scale them
+                # into the image cache alongside the other loads
+                for img_data in image_overlays:
+                    if os.path.exists(img_data['path']):
+                        executor.submit(prepare_image_overlay, img_data['path'],
+                                        primary_video.size, IMAGE_OVERLAY_PADDING)
+                if secondary_future is not None:
+                    secondary_video, secondary_meta = secondary_future.result()
+                    self._store_video_clip('secondary', secondary_file, secondary_video, secondary_meta, only_if_missing=True)
+                audio_clip = audio_future.result()
+                captions_future.result()
             
-            # Load clips like in the working video_processor.py example
-            primary_video = VideoFileClip(self.primary_video)
-            audio_clip = AudioFileClip(self.processed_audio)
             audio_duration = audio_clip.duration
             
             print(f"Audio duration: {audio_duration:.2f} seconds")
             
             # Step 2: Combine primary and secondary videos in sequence
-            if self.secondary_video:
+            if secondary_file:
                 print("Combining primary and secondary videos in sequence...")
-                secondary_video = VideoFileClip(self.secondary_video)
                 
                 # Calculate timing for video sequence
                 primary_start_duration = 6.0  # First 6 seconds of primary video
@@ -456,31 +560,20 @@ class UltimateShortEditor:
                 
                 print(f"Video sequence: Primary({primary_start_duration}s) → Secondary({secondary_duration:.1f}s) → Primary({primary_end_duration:.1f}s)")
                 
-                # Create video segments
-                primary_start = primary_video.subclipped(0, min(primary_start_duration, primary_video.duration))
-                if primary_start.duration < primary_start_duration:
+                # Create video segments. Short sources are looped by mapping time modulo the
+                # clip duration (vfx.Loop) instead of concatenating copies of the clip.
+                if primary_video.duration < primary_start_duration:
                     # Loop primary if it's shorter than 6 seconds
-                    loops_needed = int(primary_start_duration / primary_video.duration) + 1
-                    primary_clips = [primary_video] * loops_needed
-                    try:
-                        from moviepy import concatenate_videoclips
-                        looped_primary = concatenate_videoclips(primary_clips)
-                        primary_start = looped_primary.subclipped(0, primary_start_duration)
-                    except ImportError:
-                        primary_start = primary_video.subclipped(0, min(primary_start_duration, primary_video.duration))
+                    primary_start = primary_video.with_effects([vfx.Loop(duration=primary_start_duration)])
+                else:
+                    primary_start = primary_video.subclipped(0, primary_start_duration)
                 
                 # Secondary video segment
-                secondary_segment = secondary_video.subclipped(0, min(secondary_duration, secondary_video.duration))
-                if secondary_segment.duration < secondary_duration:
+                if secondary_video.duration < secondary_duration:
                     # Loop secondary if needed
-                    loops_needed = int(secondary_duration / secondary_video.duration) + 1
-                    secondary_clips = [secondary_video] * loops_needed
-                    try:
-                        from moviepy import concatenate_videoclips
-                        looped_secondary = concatenate_videoclips(secondary_clips)
-                        secondary_segment = looped_secondary.subclipped(0, secondary_duration)
-                    except ImportError:
-                        secondary_segment = secondary_video.subclipped(0, min(secondary_duration, secondary_video.duration))
+                    secondary_segment = secondary_video.with_effects([vfx.Loop(duration=secondary_duration)])
+                else:
+                    secondary_segment = secondary_video.subclipped(0, secondary_duration)
                 
                 # Primary end segment - continue from where it left off (after 6 seconds)
                 primary_start_offset = primary_start_duration  # Start from 6 seconds
@@ -489,36 +582,13 @@ class UltimateShortEditor:
                 if available_primary_remaining >= primary_end_duration:
                     # Enough primary video left to cover the end duration
                     primary_end = primary_video.subclipped(primary_start_offset, primary_start_offset + primary_end_duration)
+                elif available_primary_remaining > 0:
+                    # Use the remaining part first, then wrap around to the beginning
+                    looped_primary = primary_video.with_effects([vfx.Loop(duration=primary_start_offset + primary_end_duration)])
+                    primary_end = looped_primary.subclipped(primary_start_offset, primary_start_offset + primary_end_duration)
                 else:
-                    # Need to loop primary video for the end segment
-                    if available_primary_remaining > 0:
-                        # Use remaining part first
-                        primary_remaining = primary_video.subclipped(primary_start_offset, primary_video.duration)
-                        still_needed = primary_end_duration - available_primary_remaining
-                        
-                        # Calculate how many full loops needed for the remaining time
-                        if still_needed > 0:
-                            loops_needed = int(still_needed / primary_video.duration) + 1
-                            primary_clips = [primary_video] * loops_needed
-                            try:
-                                from moviepy import concatenate_videoclips
-                                looped_primary = concatenate_videoclips(primary_clips)
-                                additional_clip = looped_primary.subclipped(0, still_needed)
-                                primary_end = concatenate_videoclips([primary_remaining, additional_clip])
-                            except ImportError:
-                                primary_end = primary_remaining
-                        else:
-                            primary_end = primary_remaining
-                    else:
-                        # Primary video is too short, loop from beginning
-                        loops_needed = int(primary_end_duration / primary_video.duration) + 1
-                        primary_clips = [primary_video] * loops_needed
-                        try:
-                            from moviepy import concatenate_videoclips
-                            looped_primary = concatenate_videoclips(primary_clips)
-                            primary_end = looped_primary.subclipped(0, primary_end_duration)
-                        except ImportError:
-                            primary_end = primary_video.subclipped(0, min(primary_end_duration, primary_video.duration))
+                    # Primary video is too short, loop from beginning
+                    primary_end = primary_video.with_effects([vfx.Loop(duration=primary_end_duration)])
                 
                 # Concatenate all segments
                 try:
@@ -533,30 +603,29 @@ class UltimateShortEditor:
                 # Use primary video for entire duration
                 if primary_video.duration < audio_duration:
                     # Loop primary video to match audio duration
-                    loops_needed = int(audio_duration / primary_video.duration) + 1
-                    primary_clips = [primary_video] * loops_needed
-                    try:
-                        from moviepy import concatenate_videoclips
-                        looped_primary = concatenate_videoclips(primary_clips)
-                        final_clip = looped_primary.subclipped(0, audio_duration)
-                    except ImportError:
-                        final_clip = primary_video.subclipped(0, min(audio_duration, primary_video.duration))
+                    final_clip = primary_video.with_effects([vfx.Loop(duration=audio_duration)])
                 else:
                     final_clip = primary_video.subclipped(0, audio_duration)
             
             # Step 3: Add audio with BGM
             print("Adding audio with background music...")
             print(f"Original audio duration: {audio_clip.duration:.2f} seconds")
-            mixed_audio = self.add_bgm_to_audio(audio_clip)
+            bgm_clip = None
+            if bgm_future is not None:
+                try:
+                    bgm_clip = bgm_future.result()
+                except Exception as e:
+                    print(f"Error loading BGM: {e}")
+            mixed_audio = self.add_bgm_to_audio(audio_clip, bgm_clip=bgm_clip)
             print(f"Mixed audio duration: {mixed_audio.duration:.2f} seconds")
             final_clip = final_clip.with_audio(mixed_audio)
             
             # Step 4: Add heading if provided
-            if self.heading_text.strip():
+            if heading_text.strip():
                 print("Adding heading...")
                 final_clip = add_heading(
                     final_clip,
-                    text=self.heading_text,
+                    text=heading_text,
                     font_size=65,
                     color="white",
                     padding_top=30,
@@ -564,20 +633,28 @@ class UltimateShortEditor:
                 )
             
             # Step 5: Add image overlays with animation
-            if self.images_data:
-                print(f"Adding {len(self.images_data)} image overlays...")
-                for img_data in self.images_data:
+            if image_overlays:
+                print(f"Adding {len(image_overlays)} image overlays...")
+                overlay_clips = []
+                for img_data in image_overlays:
                     try:
-                        final_clip = add_image_overlay_with_animation(
+                        overlay = add_image_overlay_with_animation(
                             final_clip, 
                             img_data['path'], 
                             start_time=img_data['start_time'], 
                             end_time=img_data['end_time'], 
-                            padding=10
+                            padding=IMAGE_OVERLAY_PADDING
                         )
-                        print(f"Added image: {os.path.basename(img_data['path'])}")
+                        if overlay is not None:
+                            overlay_clips.append(overlay)
+                            print(f"Added image: {os.path.basename(img_data['path'])}")
                     except Exception as e:
                         print(f"Error adding image {img_data['path']}: {e}")
+                
+                # One composite for every overlay instead of one nested composite per image. The
+                # base stays opaque, so the caption layers after it keep their fast paste path.
+                if overlay_clips:
+                    final_clip = composite_over(final_clip, overlay_clips)
             
             # Step 6: Add auto captions if generated
             if self.auto_captions:
@@ -594,12 +671,12 @@ class UltimateShortEditor:
                     print(f"Error adding auto captions: {e}")
             
             # Step 7: Add text overlays (smaller captions)
-            if self.texts_data:
-                print(f"Adding {len(self.texts_data)} text overlays...")
+            if text_overlays:
+                print(f"Adding {len(text_overlays)} text overlays...")
                 try:
-                    texts = [txt['content'] for txt in self.texts_data]
-                    start_times = [txt['start_time'] for txt in self.texts_data]
-                    end_times = [txt['end_time'] for txt in self.texts_data]
+                    texts = [txt['content'] for txt in text_overlays]
+                    start_times = [txt['start_time'] for txt in text_overlays]
+                    end_times = [txt['end_time'] for txt in text_overlays]
                     
                     final_clip = add_smaller_captions(
                         final_clip,
@@ -626,15 +703,29 @@ class UltimateShortEditor:
             
             print(f"Exporting video to: {output_path}")
             
-            # Export in 1080p with high quality settings (expand to fill instead of padding)
-            final_clip.write_videofile(
-                output_path, 
-                codec="libx264", 
-                audio_codec="aac",
-                fps=30,
-                preset="medium",
-                ffmpeg_params=["-crf", "18", "-vf", "scale=1080:1920:force_original_aspect_ratio=increase,crop=1080:1920"]
-            )
+            # Export in 1080p with high quality settings. The clips were already filled and
+            # cropped to 1080x1920 when opened, so no scale/crop filter is needed here.
+            nvenc_preset, cq, x264_preset, crf = EXPORT_QUALITY.get(export_quality, EXPORT_QUALITY["Final"])
+            if nvenc_available():
+                print("Using NVIDIA NVENC hardware encoder")
+                final_clip.write_videofile(
+                    output_path,
+                    codec="h264_nvenc",
+                    audio_codec="aac",
+                    fps=30,
+                    preset=nvenc_preset,
+                    ffmpeg_params=["-rc", "vbr", "-cq", cq, "-b:v", "0", "-movflags", "+faststart"]
+                )
+            else:
+                final_clip.write_videofile(
+                    output_path, 
+                    codec="libx264", 
+                    audio_codec="aac",
+                    fps=30,
+                    preset=x264_preset,
+                    threads=os.cpu_count(),
+                    ffmpeg_params=["-crf", crf, "-x264-params", "aq-mode=2", "-movflags", "+faststart"]
+                )
             
             print("Video generation completed!")
             return output_path, f"✅ Video successfully created: {output_filename}\n✅ Auto-captions included: {len(self.auto_captions['captions']) if self.auto_captions else 0} captions"
@@ -749,6 +840,12 @@ def create_gradio_interface():
                 gr.Markdown("## 🚀 Generate Video")
                 gr.Markdown("*Captions will be automatically generated during video creation*")
                 
+                export_quality = gr.Radio(
+                    choices=list(EXPORT_QUALITY),
+                    value="Final",
+                    label="Export Quality",
+                    info="Preview encodes faster at a slightly lower quality"
+                )
                 generate_btn = gr.Button("🎬 Generate Final Video", variant="primary", size="lg")
                 
                 final_video_output = gr.Video(label="Generated Video", height=400)
@@ -760,7 +857,9 @@ def create_gradio_interface():
         audio_process_btn.click(
             fn=editor.process_audio_simple,
             inputs=[audio_input, silence_seconds],
-            outputs=[processed_audio_player, audio_download, audio_duration]
+            outputs=[processed_audio_player, audio_download, audio_duration],
+            # One at a time: the result is stored on the shared editor state
+            concurrency_limit=1
         )
         
         # Video handling
@@ -776,43 +875,49 @@ def create_gradio_interface():
             outputs=[secondary_video_status]
         )
         
+        # State-only handlers answer directly instead of through the queue
         # Heading
         heading_btn.click(
             fn=editor.update_heading,
             inputs=[heading_input],
-            outputs=[heading_status]
+            outputs=[heading_status],
+            queue=False
         )
         
         # Images
         image_add_btn.click(
             fn=editor.add_image,
             inputs=[image_input, image_start_time, image_end_time],
-            outputs=[images_display]
+            outputs=[images_display],
+            queue=False
         )
         
         image_remove_btn.click(
             fn=editor.remove_image,
             inputs=[image_remove_id],
-            outputs=[images_display]
+            outputs=[images_display],
+            queue=False
         )
         
         # Texts
         text_add_btn.click(
             fn=editor.add_text,
             inputs=[text_input, text_start_time, text_end_time],
-            outputs=[texts_display]
+            outputs=[texts_display],
+            queue=False
         )
         
         text_remove_btn.click(
             fn=editor.remove_text,
             inputs=[text_remove_id],
-            outputs=[texts_display]
+            outputs=[texts_display],
+            queue=False
         )
         
         # Final video generation
         generate_btn.click(
             fn=editor.generate_final_video_simple,
-            inputs=[],
+            inputs=[export_quality],
             outputs=[final_video_output, generation_status]
         )
     
@@ -1,19 +1,20 @@
 import os
 import uuid
 import re
+import numpy as np
 from pydub import AudioSegment
-from pydub.silence import split_on_silence
+from pydub.utils import db_to_float, mediainfo
 
-def clean_file_name(file_path):
+_NON_ALNUM_RUN = re.compile(r'[^a-zA-Z\d]+')
+
+def clean_file_name(file_path, extension=None):
     # Get the base file name and extension
     file_name = os.path.basename(file_path)
     file_name, file_extension = os.path.splitext(file_name)
+    file_extension = extension or file_extension
 
-    # Replace non-alphanumeric characters with an underscore
-    cleaned = re.sub(r'[^a-zA-Z\d]+', '_', file_name)
-
-    # Remove any multiple underscores
-    clean_file_name = re.sub(r'_+', '_', cleaned).strip('_')
+    # Replace each run of non-alphanumeric characters (underscores included) with one underscore
+    clean_file_name = _NON_ALNUM_RUN.sub('_', file_name).strip('_')
 
     # Generate a random UUID for uniqueness
     random_uuid = uuid.uuid4().hex[:6]
@@ -23,28 +24,171 @@ def clean_file_name(file_path):
 
     return clean_file_path
 
+def _cumulative_power(sound, seg_len, block_ms=10000):
+    """
+    Running sum of squared samples at every millisecond boundary of the segment.
+
+    Samples are viewed straight from the raw buffer and squared one block at a time,
+    so memory stays bounded by the block instead of growing 8 bytes per sample.
+    """
+    sample_dtype = {1: np.int8, 2: np.int16, 4: np.int32}.get(sound.sample_width)
+    if sample_dtype is None:
+        samples = np.asarray(sound.get_array_of_samples())
+    else:
+        samples = np.frombuffer(sound.raw_data, dtype=sample_dtype)
+    samples = samples.reshape(-1, sound.channels)
+
+    # Exact integer sums for 8/16-bit audio; wider samples would overflow int64
+    acc_dtype = np.int64 if sound.sample_width <= 2 else np.float64
+
+    # Same ms -> frame mapping as AudioSegment slicing; frames past the end count as zeros
+    boundaries = (np.arange(seg_len + 1) * sound.frame_rate / 1000.0).astype(np.int64)
+    clipped = np.minimum(boundaries, len(samples))
+
+    cumulative = np.zeros(seg_len + 1, dtype=acc_dtype)
+    for block_start in range(0, seg_len, block_ms):
+        block_end = min(block_start + block_ms, seg_len)
+        first_frame = clipped[block_start]
+        block = samples[first_frame:clipped[block_end]].astype(acc_dtype)
+        block_power = np.concatenate((np.zeros(1, dtype=acc_dtype), np.cumsum((block * block).sum(axis=1))))
+        cumulative[block_start + 1:block_end + 1] = (
+            cumulative[block_start] + block_power[clipped[block_start + 1:block_end + 1] - first_frame]
+        )
+    return cumulative, boundaries
+
+def detect_nonsilent(sound, min_silence_len=1000, silence_thresh=-16):
+    """
+    NumPy version of pydub.silence.detect_nonsilent (seek_step=1) with the same output.
+
+    The power is accumulated once per millisecond boundary, so the RMS of every
+    1 ms-stepped window is a subtraction instead of a separate audioop pass.
+    """
+    seg_len = len(sound)
+    if seg_len < min_silence_len:
+        return [[0, seg_len]]
+
+    cumulative, boundaries = _cumulative_power(sound, seg_len)
+    window_starts = np.arange(seg_len - min_silence_len + 1)
+    window_ends = np.minimum(window_starts + min_silence_len, seg_len)
+    sums = cumulative[window_ends] - cumulative[window_starts]
+    sizes = np.maximum((boundaries[window_ends] - boundaries[window_starts]) * sound.channels, 1)
+    rms = np.floor(np.sqrt(sums / sizes))
+
+    threshold = db_to_float(silence_thresh) * sound.max_possible_amplitude
+    silence_starts = np.flatnonzero(rms <= threshold)
+    if not len(silence_starts):
+        return [[0, seg_len]]
+
+    # Silent windows closer than min_silence_len belong to the same silent range
+    breaks = np.flatnonzero(np.diff(silence_starts) > max(min_silence_len, 1))
+    range_starts = silence_starts[np.concatenate(([0], breaks + 1))]
+    range_ends = silence_starts[np.concatenate((breaks, [len(silence_starts) - 1]))] + min_silence_len
+    if range_starts[0] == 0 and range_ends[0] == seg_len:
+        return []
+
+    bounds = np.column_stack((np.concatenate(([0], range_ends)), np.concatenate((range_starts, [seg_len]))))
+    nonsilent_ranges = bounds.tolist()
+    if range_ends[-1] == seg_len:
+        nonsilent_ranges.pop()
+    if nonsilent_ranges[0] == [0, 0]:
+        nonsilent_ranges.pop(0)
+    return nonsilent_ranges
+
+def _keep_ranges(sound, min_silence_len, silence_thresh, keep_silence):
+    """Millisecond ranges that split_on_silence keeps, clipped to the segment"""
+    output_ranges = [
+        [start - keep_silence, end + keep_silence]
+        for start, end in detect_nonsilent(sound, min_silence_len, silence_thresh)
+    ]
+
+    # Split the kept silence between neighbouring chunks instead of duplicating it
+    for range_i, range_ii in zip(output_ranges, output_ranges[1:]):
+        if range_ii[0] < range_i[1]:
+            range_i[1] = (range_i[1] + range_ii[0]) // 2
+            range_ii[0] = range_i[1]
+
+    return [(max(start, 0), min(end, len(sound))) for start, end in output_ranges]
+
+def split_on_silence(sound, min_silence_len=1000, silence_thresh=-16, keep_silence=100):
+    """Drop-in for pydub.silence.split_on_silence built on the NumPy detect_nonsilent"""
+    return [sound[start:end] for start, end in _keep_ranges(sound, min_silence_len, silence_thresh, keep_silence)]
+
+def _remove_silence_from_segment(sound, minimum_silence=50):
+    # Join the kept byte ranges of the source buffer directly: one copy in total, instead
+    # of a copy per chunk for the slices and another for the concatenation
+    raw = memoryview(sound.raw_data)
+    frame_width = sound.frame_width
+    parts = []
+    for start, end in _keep_ranges(sound, min_silence_len=100, silence_thresh=-45, keep_silence=minimum_silence):
+        # Same ms -> frame mapping as AudioSegment slicing, including its zero padding
+        # when the last millisecond rounds past the final frame
+        start_frame = int(sound.frame_count(ms=start))
+        end_frame = int(sound.frame_count(ms=end))
+        part = raw[start_frame * frame_width:end_frame * frame_width]
+        parts.append(part)
+        missing_frames = (end_frame - start_frame) - len(part) // frame_width
+        if missing_frames > 0:
+            parts.append(b"\0" * (missing_frames * frame_width))
+    return sound._spawn(b"".join(parts))
+
+# ffmpeg muxer for extensions that aren't muxer names themselves
+_EXPORT_FORMATS = {".m4a": "mp4", ".aac": "adts"}
+
+def _export_without_silence(combined, file_path):
+    """
+    Write the cleaned audio in the source's format and bitrate, so a compressed upload stays
+    about its own size instead of growing ~10 MB per minute as PCM WAV.
+
+    WAV sources are written directly by pydub; other formats are re-encoded through ffmpeg,
+    falling back to WAV when that fails.
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension and extension != ".wav":
+        output_path = clean_file_name(file_path)
+        try:
+            bitrate = mediainfo(file_path).get("bit_rate")
+        except Exception:
+            bitrate = None  # no ffprobe: ffmpeg's default bitrate for the format
+        try:
+            combined.export(output_path, format=_EXPORT_FORMATS.get(extension, extension[1:]), bitrate=bitrate)
+            return output_path
+        except Exception as e:
+            # pydub's message carries ffmpeg's whole log; the exception type is enough here
+            print(f"Warning: Could not export as {extension} ({type(e).__name__}), writing WAV instead")
+            if os.path.exists(output_path):
+                os.remove(output_path)
+
+    output_path = clean_file_name(file_path, ".wav")
+    combined.export(output_path, format="wav")
+    return output_path
+
 def remove_silence(file_path, minimum_silence=50):
     sound = AudioSegment.from_file(file_path)  # auto-detects format
-    audio_chunks = split_on_silence(sound,
-                                    min_silence_len=100,
-                                    silence_thresh=-45,
-                                    keep_silence=minimum_silence) 
-    combined = AudioSegment.empty()
-    for chunk in audio_chunks:
-        combined += chunk
-    output_path = clean_file_name(file_path)        
-    combined.export(output_path)  # format inferred from output file extension
-    return output_path
+    combined = _remove_silence_from_segment(sound, minimum_silence)
+    return _export_without_silence(combined, file_path)
 
 def calculate_duration(file_path):
-    audio = AudioSegment.from_file(file_path)
-    duration_seconds = len(audio) / 1000.0  # pydub uses milliseconds
-    return duration_seconds
+    # Read the duration from the container with ffprobe instead of decoding every sample
+    try:
+        return float(mediainfo(file_path)["duration"])
+    except Exception:
+        audio = AudioSegment.from_file(file_path)
+        duration_seconds = len(audio) / 1000.0  # pydub uses milliseconds
+        return duration_seconds
 
 def process_audio(audio_file, seconds=0.05):
     keep_silence = int(seconds * 1000)
-    output_audio_file = remove_silence(audio_file, minimum_silence=keep_silence)
-    before = calculate_duration(audio_file)
-    after = calculate_duration(output_audio_file)
+    # Decode once; both durations come from the in-memory segments
+    sound = AudioSegment.from_file(audio_file)
+    combined = _remove_silence_from_segment(sound, minimum_silence=keep_silence)
+    output_audio_file = _export_without_silence(combined, audio_file)
+    before = len(sound) / 1000.0
+    after = len(combined) / 1000.0
     text = f"Old Duration: {before:.3f} seconds \nNew Duration: {after:.3f} seconds"
-    return output_audio_file, output_audio_file, text
\ No newline at end of file
+    return output_audio_file, output_audio_file, text
+
+if __name__ == "__main__":
+    # Worker entry point used by the editor: prints process_audio's result as JSON
+    import json
+    import sys
+    print(json.dumps(process_audio(sys.argv[1], float(sys.argv[2]))))
@@ -1,30 +1,198 @@
 from faster_whisper import WhisperModel
+try:
+    from faster_whisper import BatchedInferencePipeline
+except ImportError:  # faster-whisper < 1.1
+    BatchedInferencePipeline = None
+from functools import lru_cache
 from typing import List
+import os
+import queue
+import threading
+import av
+import ctranslate2
+import numpy as np
+
+# Whisper works on 16 kHz mono audio
+SAMPLING_RATE = 16000
+
+# Half precision on GPU uses tensor cores, int8 on CPU uses the quantized GEMM kernels.
+# Later entries are fallbacks for hardware that lacks the preferred type.
+COMPUTE_TYPE_PREFERENCES = {
+    "cuda": ("float16", "int8_float16", "int8"),
+    "cpu": ("int8", "float32"),
+}
+
+def default_device():
+    """Use CUDA when CTranslate2 can see a GPU, otherwise fall back to CPU"""
+    try:
+        return "cuda" if ctranslate2.get_cuda_device_count() > 0 else "cpu"
+    except Exception:
+        return "cpu"
+
+def iter_audio_chunks(audio_path, chunk_seconds, sampling_rate=SAMPLING_RATE):
+    """
+    Decode audio as mono float32 at `sampling_rate` and yield (offset_seconds, samples)
+    chunks of `chunk_seconds`, so only one chunk is ever held in memory.
+    """
+    chunk_size = int(chunk_seconds * sampling_rate)
+    resampler = av.audio.resampler.AudioResampler(format="s16", layout="mono", rate=sampling_rate)
+    pending = []
+    pending_size = 0
+    offset = 0
+
+    def to_float(samples):
+        return samples.astype(np.float32) / 32768.0
+
+    with av.open(audio_path, metadata_errors="ignore") as container:
+        for frame in container.decode(audio=0):
+            for resampled in resampler.resample(frame):
+                pending.append(resampled.to_ndarray().reshape(-1))
+                pending_size += pending[-1].shape[0]
+
+                while pending_size >= chunk_size:
+                    buffer = np.concatenate(pending)
+                    yield offset / sampling_rate, to_float(buffer[:chunk_size])
+                    offset += chunk_size
+                    pending = [buffer[chunk_size:]]
+                    pending_size = pending[0].shape[0]
+
+        for resampled in resampler.resample(None):
+            pending.append(resampled.to_ndarray().reshape(-1))
+            pending_size += pending[-1].shape[0]
+
+    if pending_size:
+        yield offset / sampling_rate, to_float(np.concatenate(pending))
+
+def prefetch(iterable, depth=2):
+    """
+    Iterate `iterable` on a background thread, keeping up to `depth` items ready, so
+    producing the next item (e.g. decoding audio) overlaps with using the current one.
+    """
+    items = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+    end = object()
+
+    def put(item):
+        # Give up once the consumer has gone away instead of blocking forever
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+            put((end, None))
+        except Exception as e:
+            put((end, e))
+        finally:
+            if hasattr(iterable, "close"):
+                iterable.close()
+
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while True:
+            item, error = items.get()
+            if item is end:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
+
+def default_compute_type(device):
+    """Fastest compute type in COMPUTE_TYPE_PREFERENCES that the device supports"""
+    try:
+        supported = ctranslate2.get_supported_compute_types(device)
+    except Exception:
+        return "default"
+
+    for compute_type in COMPUTE_TYPE_PREFERENCES.get(device, ()):
+        if compute_type in supported:
+            return compute_type
+    return "default"
 
 class GenerateCaptions:
-    def __init__(self, model_size="medium", device="cpu"):
-        self.model = WhisperModel(model_size, device=device)
+    def __init__(self, model_size="medium", device=None, compute_type=None, cpu_threads=None, batch_size=None,
+                 beam_size=1, condition_on_previous_text=False, temperature=0.0):
+        self.device = device or default_device()
+        self.compute_type = compute_type or default_compute_type(self.device)
+        self.model = WhisperModel(
+            model_size,
+            device=self.device,
+            compute_type=self.compute_type,
+            cpu_threads=cpu_threads or os.cpu_count() or 0,
+        )
+
+        # Greedy decoding at a fixed temperature without prompting on earlier text, tuned for
+        # short-form clips; long recordings can pass faster-whisper's defaults (beam_size=5,
+        # condition_on_previous_text=True and its temperature fallback schedule)
+        self.beam_size = beam_size
+        self.condition_on_previous_text = condition_on_previous_text
+        self.temperature = temperature
+
+        # Batched inference decodes several 30 s windows per forward pass, which mostly pays off on GPU
+        self.batch_size = batch_size
+        self.pipeline = None
+        if batch_size:
+            if BatchedInferencePipeline is None:
+                print("Warning: batched transcription needs faster-whisper>=1.1, transcribing sequentially")
+            else:
+                self.pipeline = BatchedInferencePipeline(model=self.model)
+
+    def get_word_timestamps_faster_whisper(self, audio_file_path, chunk_seconds=None) -> List[dict]:
+        # Long recordings can be streamed in fixed windows instead of decoding the whole file up front;
+        # the next window is decoded while Whisper transcribes the current one
+        if chunk_seconds:
+            sources = prefetch(iter_audio_chunks(audio_file_path, chunk_seconds))
+        else:
+            sources = [(0.0, audio_file_path)]
 
-    def get_word_timestamps_faster_whisper(self, audio_file_path) -> List[dict]:
-        segments, info = self.model.transcribe(audio_file_path, language="en", word_timestamps=True)
-        segments = list(segments)
         wordlevel_info = []
 
-        for segment in segments:
-            for word in segment.words:
-                wordlevel_info.append({'word':word.word,'start':word.start,'end':word.end})
+        for offset, audio in sources:
+            if self.pipeline is not None:
+                # Batched windows are decoded independently, so there is no previous text to condition on
+                segments, info = self.pipeline.transcribe(
+                    audio,
+                    language="en",
+                    word_timestamps=True,
+                    batch_size=self.batch_size,
+                    beam_size=self.beam_size,
+                    temperature=self.temperature,
+                )
+            else:
+                segments, info = self.model.transcribe(
+                    audio,
+                    language="en",
+                    word_timestamps=True,
+                    beam_size=self.beam_size,
+                    condition_on_previous_text=self.condition_on_previous_text,
+                    temperature=self.temperature,
+                )
 
-        return wordlevel_info
+            # segments is a generator; each one is decoded as it is consumed
+            for segment in segments:
+                for word in segment.words:
+                    wordlevel_info.append({'word':word.word,'start':word.start + offset,'end':word.end + offset})
 
-    def generate(self, audio_path):
-        word_timestamps = self.get_word_timestamps_faster_whisper(audio_path)
+        return wordlevel_info
 
-        captions = [word_info['word'] for word_info in word_timestamps]
-        captions = list(map(str.upper, captions))
-        captions = list(map(str.strip, captions))
+    def generate(self, audio_path, chunk_seconds=None):
+        word_timestamps = self.get_word_timestamps_faster_whisper(audio_path, chunk_seconds=chunk_seconds)
 
-        start_times = [word_info['start'] for word_info in word_timestamps]
-        durations = [word_info['end'] - word_info['start'] for word_info in word_timestamps]
+        # One pass over the words fills all three parallel lists
+        captions, start_times, durations = [], [], []
+        for word_info in word_timestamps:
+            captions.append(word_info['word'].upper().strip())
+            start_times.append(word_info['start'])
+            durations.append(word_info['end'] - word_info['start'])
 
         return {
             'captions': captions,
@@ -33,6 +201,47 @@ class GenerateCaptions:
             'word_timestamps': word_timestamps
         }
     
+def prepare_model(model_name, output_dir, quantization="int8"):
+    """
+    Convert a Hugging Face Whisper checkpoint (e.g. "openai/whisper-medium") to a CTranslate2
+    model with its weights stored already quantized, so GenerateCaptions(model_size=output_dir)
+    loads a smaller model with no conversion at start-up. Needs `transformers`; run once at install,
+    e.g. `python add_captions.py --prepare-model openai/whisper-medium models/whisper-medium-int8`.
+    """
+    from ctranslate2.converters import TransformersConverter
+
+    converter = TransformersConverter(model_name, copy_files=["tokenizer.json", "preprocessor_config.json"])
+    return converter.convert(output_dir, quantization=quantization)
+
+_caption_generator_lock = threading.Lock()
+
+def get_caption_generator(model_size="medium", device=None, compute_type=None, batch_size=None,
+                          beam_size=1, condition_on_previous_text=False, temperature=0.0):
+    """Shared GenerateCaptions instance, so the Whisper weights are only loaded once per process"""
+    # Serialised so concurrent first requests wait for one load instead of each loading the model
+    with _caption_generator_lock:
+        return _get_caption_generator_cached(
+            model_size, device, compute_type, batch_size, beam_size, condition_on_previous_text, temperature
+        )
+
+@lru_cache(maxsize=1)
+def _get_caption_generator_cached(model_size, device, compute_type, batch_size,
+                                  beam_size, condition_on_previous_text, temperature):
+    return GenerateCaptions(
+        model_size=model_size,
+        device=device,
+        compute_type=compute_type,
+        batch_size=batch_size,
+        beam_size=beam_size,
+        condition_on_previous_text=condition_on_previous_text,
+        temperature=temperature,
+    )
+
+def clear_caption_generator():
+    """Drop the shared model so its weights (and any VRAM) can be freed in long-running processes"""
+    with _caption_generator_lock:
+        _get_caption_generator_cached.cache_clear()
+
 if __name__ == "__main__":
     generator = GenerateCaptions(model_size="medium", device="cpu")
     result = generator.generate("/Users/anubhavchoubey/Documents/Codes/Own_Projects/Ultimate_Shorts_Editor/testing_stuff/audio_processed.wav")
@@ -1,9 +1,41 @@
-from moviepy import VideoFileClip, CompositeVideoClip, ImageClip, concatenate_videoclips, AudioFileClip, TextClip, vfx
+from moviepy import VideoClip, VideoFileClip, CompositeVideoClip, ImageClip, concatenate_videoclips, AudioFileClip, TextClip, vfx
+from moviepy.config import FFMPEG_BINARY
+from moviepy.tools import compute_position
+from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+from functools import lru_cache
 from typing import List
 import os
 import random
+import subprocess
 import numpy as np
-    
+from PIL import Image, ImageFont
+
+
+@lru_cache(maxsize=1)
+def nvenc_available() -> bool:
+    """Check once whether ffmpeg can encode with NVIDIA's h264_nvenc"""
+    try:
+        encoders = subprocess.run(
+            [FFMPEG_BINARY, "-hide_banner", "-encoders"],
+            capture_output=True,
+            timeout=30,
+        )
+        if b"h264_nvenc" not in encoders.stdout:
+            return False
+
+        # The encoder can be compiled in without a usable GPU, so try a tiny encode
+        probe = subprocess.run(
+            [FFMPEG_BINARY, "-hide_banner", "-loglevel", "error",
+             "-f", "lavfi", "-i", "color=c=black:s=256x256:d=0.1",
+             "-c:v", "h264_nvenc", "-f", "null", "-"],
+            capture_output=True,
+            timeout=30,
+        )
+        return probe.returncode == 0
+    except Exception as e:
+        print(f"Warning: Could not probe ffmpeg encoders: {e}")
+        return False
+
 def add_primary_secondary_videos(primary_video: VideoFileClip, secondary_video: VideoFileClip, audio_duration: float) -> VideoFileClip:
     """Combine primary and secondary videos with improved stability"""
     try:
@@ -64,22 +96,92 @@ def add_primary_secondary_videos(primary_video: VideoFileClip, secondary_video:
             return primary_video
 
 
-def add_image_overlay(video: VideoFileClip, image_path: str, start_time: float, end_time: float, padding: int = 5) -> VideoFileClip:
+def probe_media(file_path: str) -> dict:
+    """
+    ffmpeg metadata for a media file, without opening a decoder. Probes are cached
+    per file version, so re-adding or re-rendering the same file skips the ffmpeg spawn.
+    The returned dict is shared between callers and must not be modified.
+    """
+    return _probe_media_cached(file_path, os.path.getmtime(file_path))
+
+@lru_cache(maxsize=32)
+def _probe_media_cached(file_path: str, mtime: float) -> dict:
+    return ffmpeg_parse_infos(file_path)
+
+def get_media_duration(file_path: str) -> float:
+    """Read a media file's duration from the container without opening a decoder"""
+    return probe_media(file_path)["duration"]
+
+
+def _load_scaled_image(image_path: str, max_width: float, max_height: float) -> np.ndarray:
+    """
+    Decode an image and scale it to fit inside max_width x max_height in one pass.
+
+    Large JPEGs are decoded straight at reduced resolution, so a 12MP photo never
+    has to be fully decoded just to be shrunk to a shorts overlay. Results are cached
+    per file version and target box, so re-rendering the same overlay skips Pillow.
+    """
+    return _load_scaled_image_cached(image_path, os.path.getmtime(image_path), max_width, max_height)
+
+@lru_cache(maxsize=32)
+def _load_scaled_image_cached(image_path: str, mtime: float, max_width: float, max_height: float) -> np.ndarray:
+    with Image.open(image_path) as img:
+        scale = min(max_width / img.width, max_height / img.height)
+        new_size = (max(1, int(img.width * scale)), max(1, int(img.height * scale)))
+
+        if scale < 1:
+            img.draft(img.mode, new_size)
+
+        has_alpha = "A" in img.getbands() or "transparency" in img.info
+        img = img.convert("RGBA" if has_alpha else "RGB")
+        img = img.resize(new_size, Image.LANCZOS, reducing_gap=3.0)
+        return np.asarray(img)
+
+
+def _slide_in_out_y(t, duration: float, transition_duration: float, center_y: float, bottom_y: float):
+    """
+    Vertical position of an overlay that eases up from the bottom, holds at the
+    centre and eases back down. Branch-free, so `t` may be a scalar or a NumPy array.
+    """
+    rise = np.clip(t / transition_duration, 0.0, 1.0)
+    fall = np.clip((t - (duration - transition_duration)) / transition_duration, 0.0, 1.0)
+    travel = bottom_y - center_y
+    return bottom_y - travel * (1 - (1 - rise) ** 2) + travel * fall ** 2
+
+
+def _slide_in_out_position(duration: float, fps: float, center_x: float, center_y: float, bottom_y: float):
+    """
+    Position function for the slide in/out animation. The animation is fixed, so it
+    is evaluated once on the frame grid and each frame only indexes into the table.
+    """
+    transition_duration = min(0.5, duration / 3)
+    positions_y = _slide_in_out_y(
+        np.arange(int(np.ceil(duration * fps)) + 1) / fps,
+        duration, transition_duration, center_y, bottom_y
+    ).tolist()
+    last_index = len(positions_y) - 1
+
+    def position_function(t):
+        """Look up the precomputed position for the frame at time t"""
+        return (center_x, positions_y[min(max(int(round(t * fps)), 0), last_index)])
+
+    return position_function
+
+
+def prepare_image_overlay(image_path: str, video_size, padding: int = 5) -> np.ndarray:
+    """
+    Decode and scale an overlay image to fit the video, leaving `padding` percent
+    of each dimension free. Cached per file, so it can be called ahead of time to prewarm.
+    """
+    video_width, video_height = video_size
+    return _load_scaled_image(image_path, video_width * (1 - padding / 100), video_height * (1 - padding / 100))
+
+def image_overlay_clip(video, image_path: str, start_time: float, end_time: float, padding: int = 5) -> ImageClip:
+    """Overlay image clip for `video` that slides in from the bottom, holds at the centre and slides out"""
     video_width, video_height = video.size
     
-    max_width = video_width * (1 - padding / 100)
-    max_height = video_height * (1 - padding / 100)
-    
-    image = ImageClip(image_path)
-    
-    img_width, img_height = image.size
-    scale_width = max_width / img_width
-    scale_height = max_height / img_height
-    scale = min(scale_width, scale_height)
-    
-    new_width = int(img_width * scale)
-    new_height = int(img_height * scale)
-    image = image.resized((new_width, new_height))
+    image = ImageClip(prepare_image_overlay(image_path, video.size, padding))
+    new_width, new_height = image.size
     
     duration = end_time - start_time
     image = image.with_duration(duration).with_start(start_time)
@@ -88,24 +190,10 @@ def add_image_overlay(video: VideoFileClip, image_path: str, start_time: float,
     center_y = (video_height - new_height) // 2
     bottom_y = video_height
 
-    transition_duration = min(0.5, duration / 3)
+    return image.with_position(_slide_in_out_position(duration, video.fps or 30, center_x, center_y, bottom_y))
 
-    def position_function(t):
-        """Calculate position based on time"""
-        if t < transition_duration:
-            progress = t / transition_duration
-            progress = 1 - (1 - progress) ** 2
-            y = bottom_y - (bottom_y - center_y) * progress
-            return (center_x, y)
-        elif t > (duration - transition_duration):
-            progress = (t - (duration - transition_duration)) / transition_duration
-            progress = progress ** 2
-            y = center_y + (bottom_y - center_y) * progress
-            return (center_x, y)
-        else:
-            return (center_x, center_y)
-    
-    image = image.with_position(position_function)
+def add_image_overlay(video: VideoFileClip, image_path: str, start_time: float, end_time: float, padding: int = 5) -> VideoFileClip:
+    image = image_overlay_clip(video, image_path, start_time, end_time, padding)
     
     final_video = CompositeVideoClip([video, image])
     
@@ -122,7 +210,9 @@ def add_captions(
 ) -> CompositeVideoClip:
     """Add captions with better error handling"""
     try:
-        clips = [video]
+        starts, ends, frames, masks, positions = [], [], [], [], []
+        rendered = {}  # caption text -> (frame, mask, position), each string is rasterized once
+        caption_size = video.size
         
         # Validate font file
         if not os.path.exists(font):
@@ -139,41 +229,246 @@ def add_captions(
                 if start_time < 0:
                     start_time = 0
                 
-                # Create text clip with error handling
-                text_clip_params = {
-                    "text": text.strip(),
-                    "font_size": max(10, font_size),
-                    "color": color,
-                    "method": "caption",
-                    "size": video.size,
-                    "duration": duration,
-                    "text_align": "center",
-                    "stroke_color": "black",
-                    "stroke_width": 15,
-                    "vertical_align": "center",
-                }
-                
-                if font:
-                    text_clip_params["font"] = font
+                text = text.strip()
+                if text not in rendered:
+                    # Create text clip with error handling. It is laid out on the full
+                    # frame, so the stroke is never clipped, then cropped to the visible
+                    # pixels so the compositor only blends the caption's own box.
+                    text_clip_params = {
+                        "text": text,
+                        "font_size": max(10, font_size),
+                        "color": color,
+                        "method": "caption",
+                        "size": caption_size,
+                        "text_align": "center",
+                        "stroke_color": "black",
+                        "stroke_width": 15,
+                        "vertical_align": "center",
+                    }
+                    
+                    if font:
+                        text_clip_params["font"] = font
+                    
+                    text_clip = TextClip(**text_clip_params)
+                    rendered[text] = _crop_to_alpha(text_clip.get_frame(0), text_clip.mask.get_frame(0))
                 
-                text_clip = TextClip(**text_clip_params).with_start(start_time)
-                clips.append(text_clip)
+                if rendered[text] is None:
+                    continue
+                frame, mask, position = rendered[text]
+                frames.append(frame)
+                masks.append(mask)
+                positions.append(position)
+                starts.append(start_time)
+                ends.append(start_time + duration)
                 
             except Exception as e:
                 print(f"Error creating caption '{text[:20]}...': {e}")
                 continue
 
-        if len(clips) == 1:
+        if not frames:
             # No captions were added successfully
             return video
             
-        video_with_text = CompositeVideoClip(clips)
+        if video.mask is not None:
+            # Over a transparent base each caption stays its own clip, so MoviePy merges their masks too
+            return CompositeVideoClip([video] + [
+                ImageClip(frame).with_mask(ImageClip(mask, is_mask=True))
+                .with_position(position).with_start(start).with_duration(end - start)
+                for frame, mask, position, start, end in zip(frames, masks, positions, starts, ends)
+            ])
+
+        caption_layer = _caption_timeline_clip(starts, ends, frames, masks, positions, video.duration)
+        video_with_text = composite_over(video, [caption_layer])
         return video_with_text
         
     except Exception as e:
         print(f"Error in add_captions: {e}")
         return video
 
+def composite_over(video, clips: list) -> CompositeVideoClip:
+    """
+    Composite clips on top of a base video.
+
+    An opaque base is used directly as the compositor's background, so MoviePy
+    doesn't allocate an extra canvas and composite a full-frame mask every frame.
+    """
+    if video.mask is not None:
+        return CompositeVideoClip([video] + clips)
+
+    composite = CompositeVideoClip([video] + clips, use_bgclip=True)
+    # With use_bgclip the base isn't counted for duration or audio, so carry them over
+    if video.duration is not None:
+        composite = composite.with_duration(video.duration)
+    if video.audio is not None:
+        composite = composite.with_audio(video.audio)
+    return composite
+
+def _crop_to_alpha(frame: np.ndarray, mask: np.ndarray):
+    """Crop a rendered frame and mask to the mask's non-zero box; returns (frame, mask, (x, y)) or None if empty"""
+    rows = np.flatnonzero(mask.any(axis=1))
+    cols = np.flatnonzero(mask.any(axis=0))
+    if rows.size == 0:
+        return None
+    top, bottom, left, right = rows[0], rows[-1] + 1, cols[0], cols[-1] + 1
+    return frame[top:bottom, left:right], mask[top:bottom, left:right], (int(left), int(top))
+
+def _caption_timeline_clip(starts, ends, frames, masks, positions, duration) -> VideoClip:
+    """
+    Single clip showing every pre-rendered caption active at time t.
+
+    Caption boundaries are split into disjoint intervals, each listing its active
+    captions in input order, so a frame costs one binary search instead of the
+    compositor checking every caption clip, and overlapping captions still stack
+    exactly as separate layers would.
+    """
+    starts = np.asarray(starts, dtype=np.float64)
+    ends = np.asarray(ends, dtype=np.float64)
+    boundaries = np.unique(np.concatenate([starts, ends]))
+
+    active = [[] for _ in boundaries]
+    for idx, (start, end) in enumerate(zip(starts, ends)):
+        first, last = np.searchsorted(boundaries, [start, end])
+        for interval in range(first, last):
+            active[interval].append(idx)
+
+    layers = [
+        _BoxBlendClip(lambda t, frame=frame: frame).with_mask(ImageClip(mask, is_mask=True)).with_position(position)
+        for frame, mask, position in zip(frames, masks, positions)
+    ]
+    return _CaptionTimelineClip(boundaries, active, layers, duration)
+
+class _CaptionTimelineClip(VideoClip):
+    """Composites whichever caption layers are active at t, in their original stacking order"""
+
+    def __init__(self, boundaries, active, layers, duration):
+        self.boundaries = boundaries
+        self.active = active
+        self.layers = layers
+
+        empty_frame = np.zeros((1, 1, 3), dtype=np.uint8)
+        empty_mask = np.zeros((1, 1), dtype=float)
+
+        # Standalone frames show the top caption; compose_on draws all of them
+        def frame_function(t):
+            active_layers = self.active_layers(t)
+            return active_layers[-1].get_frame(0) if active_layers else empty_frame
+
+        def mask_function(t):
+            active_layers = self.active_layers(t)
+            return active_layers[-1].mask.get_frame(0) if active_layers else empty_mask
+
+        super().__init__(frame_function, duration=duration, has_constant_size=False)
+        self.mask = VideoClip(mask_function, is_mask=True, duration=duration, has_constant_size=False)
+
+    def active_layers(self, t):
+        interval = int(np.searchsorted(self.boundaries, t, side="right")) - 1
+        return [self.layers[idx] for idx in self.active[interval]] if interval >= 0 else []
+
+    def compose_on(self, background, t):
+        for layer in self.active_layers(t - self.start):
+            background = layer.compose_on(background, 0)
+        return background
+
+class _BoxBlendClip(VideoClip):
+    """
+    Masked clip that only blends over its own rectangle when composited.
+
+    MoviePy's generic compose_on converts the whole background to RGBA and
+    alpha-composites a full-size canvas every frame. Over an opaque background
+    a masked paste of the caption box produces the same picture.
+    """
+
+    def compose_on(self, background, t):
+        if self.mask is None or background.mode[-1] == "A":
+            return super().compose_on(background, t)
+
+        ct = t - self.start
+        clip_img = Image.fromarray(self.get_frame(ct).astype("uint8"))
+        mask_img = Image.fromarray((self.mask.get_frame(ct) * 255).astype("uint8"))
+        if mask_img.size != clip_img.size:
+            return super().compose_on(background, t)
+
+        pos = compute_position(clip_img.size, background.size, self.pos(ct), self.relative_pos)
+        background.paste(clip_img, pos, mask_img)
+        return background
+
+def _ass_timestamp(seconds: float) -> str:
+    """Format seconds as an ASS H:MM:SS.cc timestamp"""
+    centiseconds = int(round(max(0.0, seconds) * 100))
+    hours, centiseconds = divmod(centiseconds, 360000)
+    minutes, centiseconds = divmod(centiseconds, 6000)
+    secs, centiseconds = divmod(centiseconds, 100)
+    return f"{hours}:{minutes:02d}:{secs:02d}.{centiseconds:02d}"
+
+def _ass_color(color: str) -> str:
+    """Convert a colour name or hex string to ASS &HAABBGGRR notation"""
+    r, g, b = _hex_to_rgb(color)
+    return f"&H00{b:02X}{g:02X}{r:02X}"
+
+def write_ass_captions(
+    output_path: str,
+    texts: List[str],
+    start_times: List[float],
+    durations: List[float],
+    video_size: tuple = (1080, 1920),
+    font_size: int = 60,
+    color: str = "white",
+    font: str = "/Users/anubhavchoubey/Documents/Codes/Own_Projects/Ultimate_Shorts_Editor/static/Utendo-Regular.ttf",
+    stroke_color: str = "black",
+    stroke_width: int = 15,
+) -> str:
+    """
+    Write captions as an ASS subtitle file styled like add_captions, so ffmpeg's
+    libass can burn them in without rendering any frames in Python.
+
+    Returns the font file the style refers to, or None when falling back to the default font.
+    """
+    font_file = None
+    font_name = "Arial"
+    if font and os.path.exists(font):
+        try:
+            font_name = ImageFont.truetype(font, max(10, font_size)).getname()[0]
+            font_file = font
+        except Exception as e:
+            print(f"Warning: Could not read font {font}: {e}")
+    else:
+        print(f"Warning: Font file {font} not found, using default")
+
+    width, height = video_size
+    lines = [
+        "[Script Info]",
+        "ScriptType: v4.00+",
+        f"PlayResX: {width}",
+        f"PlayResY: {height}",
+        "WrapStyle: 0",
+        "ScaledBorderAndShadow: yes",
+        "",
+        "[V4+ Styles]",
+        "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, "
+        "Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, "
+        "Alignment, MarginL, MarginR, MarginV, Encoding",
+        f"Style: Default,{font_name},{max(10, font_size)},{_ass_color(color)},{_ass_color(color)},"
+        f"{_ass_color(stroke_color)},&H00000000,0,0,0,0,100,100,0,0,1,{stroke_width},0,5,0,0,0,1",
+        "",
+        "[Events]",
+        "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text",
+    ]
+
+    for text, start_time, duration in zip(texts, start_times, durations):
+        if not text or not text.strip() or duration <= 0:
+            continue
+        start_time = max(0.0, start_time)
+        # Braces open override blocks and a backslash starts \N-style escapes in ASS,
+        # so none of them can appear in plain text
+        text = text.strip().replace("\\", "/").replace("{", "(").replace("}", ")").replace("\n", "\\N")
+        lines.append(
+            f"Dialogue: 0,{_ass_timestamp(start_time)},{_ass_timestamp(start_time + duration)},Default,,0,0,0,,{text}"
+        )
+
+    with open(output_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    return font_file
+
 def add_heading(
     video,
     text: str,
@@ -221,7 +516,11 @@ def add_heading(
         if font:
             heading_params["font"] = font
             
-        heading_clip = TextClip(**heading_params).with_duration(video.duration)
+        # Rasterized once; pasted over just its own box on each frame
+        text_clip = TextClip(**heading_params)
+        heading_frame = text_clip.get_frame(0)
+        heading_clip = (_BoxBlendClip(lambda t: heading_frame, duration=video.duration)
+                        .with_mask(ImageClip(text_clip.mask.get_frame(0), is_mask=True).with_duration(video.duration)))
         
         # Position the heading at the top center with padding
         x_position = max(0, (video_width - heading_clip.w) // 2)
@@ -234,8 +533,7 @@ def add_heading(
         heading_clip = heading_clip.with_position((x_position, y_position))
         
         # Combine with video
-        final_video = CompositeVideoClip([video, heading_clip])
-        return final_video
+        return composite_over(video, [heading_clip])
         
     except Exception as e:
         print(f"Error in add_heading: {e}")
@@ -259,7 +557,8 @@ def add_smaller_captions(
     """Add smaller captions with background at bottom of video with error handling"""
     try:
         video_width, video_height = video.size
-        clips = [video]
+        max_text_width = max(100, video_width - (2 * padding_horizontal))
+        clips = []
         
         # Validate font file
         if not os.path.exists(font):
@@ -276,8 +575,6 @@ def add_smaller_captions(
                 if start_time < 0:
                     start_time = 0
                 
-                max_text_width = max(100, video_width - (2 * padding_horizontal))
-                
                 # Create text clip with error handling
                 text_params = {
                     "text": text.strip(),
@@ -298,29 +595,26 @@ def add_smaller_captions(
                 bg_width = text_width + (2 * bg_padding)
                 bg_height = text_height + (2 * bg_padding)
                 
-                # Create background clip (semi-transparent rectangle)
+                # Bake the semi-transparent background and the text into one layer,
+                # so the compositor blends one clip per caption instead of two
                 try:
                     bg_color_rgb = _hex_to_rgb(bg_color)
-                    bg_array = np.full((bg_height, bg_width, 3), bg_color_rgb, dtype=np.uint8)
+                    box_frame, box_mask = _boxed_caption(
+                        text_clip.get_frame(0),
+                        text_clip.mask.get_frame(0),
+                        bg_color_rgb,
+                        max(0.1, min(1.0, bg_opacity)),
+                        bg_padding,
+                    )
                     
-                    bg_clip = (ImageClip(bg_array)
-                              .with_duration(duration)
-                              .with_start(start_time)
-                              .with_opacity(max(0.1, min(1.0, bg_opacity))))
+                    box_clip = (_BoxBlendClip(lambda t, frame=box_frame: frame, duration=duration)
+                               .with_mask(ImageClip(box_mask, is_mask=True).with_duration(duration))
+                               .with_start(start_time))
                     
-                    # Position background at bottom center
+                    # Position the box at bottom center
                     bg_x = max(0, (video_width - bg_width) // 2)
                     bg_y = max(0, video_height - padding_bottom - bg_height)
-                    bg_clip = bg_clip.with_position((bg_x, bg_y))
-                    
-                    # Position text on top of background
-                    text_x = max(0, (video_width - text_width) // 2)
-                    text_y = max(0, video_height - padding_bottom - bg_height + bg_padding)
-                    text_clip = text_clip.with_position((text_x, text_y))
-                    
-                    # Add both background and text to clips
-                    clips.append(bg_clip)
-                    clips.append(text_clip)
+                    clips.append(box_clip.with_position((bg_x, bg_y)))
                     
                 except Exception as e:
                     print(f"Error creating background for caption '{text[:20]}...': {e}")
@@ -334,17 +628,38 @@ def add_smaller_captions(
                 print(f"Error adding smaller caption '{text[:20]}...': {e}")
                 continue
         
-        if len(clips) == 1:
+        if not clips:
             # No captions were added successfully
             return video
-            
-        return CompositeVideoClip(clips)
+        
+        # Only the captions active at t are blended, each over just its own box
+        return composite_over(video, clips)
         
     except Exception as e:
         print(f"Error in add_smaller_captions: {e}")
         return video
 
 
+def _boxed_caption(text_frame: np.ndarray, text_mask: np.ndarray, bg_rgb: tuple, bg_opacity: float, padding: int):
+    """
+    Flatten caption text over a padded, semi-transparent background into a single
+    RGB frame and mask that composite the same as the background and text layered.
+    """
+    text_height, text_width = text_mask.shape
+    box_height, box_width = text_height + 2 * padding, text_width + 2 * padding
+    inner = (slice(padding, padding + text_height), slice(padding, padding + text_width))
+
+    mask = np.full((box_height, box_width), bg_opacity, dtype=float)
+    mask[inner] = text_mask + bg_opacity * (1 - text_mask)
+
+    frame = np.empty((box_height, box_width, 3), dtype=float)
+    frame[:] = bg_rgb
+    text_alpha = text_mask[..., None]
+    blended = text_frame * text_alpha + np.asarray(bg_rgb, dtype=float) * bg_opacity * (1 - text_alpha)
+    frame[inner] = blended / np.maximum(mask[inner], 1e-6)[..., None]
+
+    return np.clip(np.round(frame), 0, 255).astype(np.uint8), mask
+
 def _hex_to_rgb(hex_color: str) -> tuple:
     """Convert hex color to RGB tuple."""
     if hex_color.startswith('#'):
@@ -0,0 +1,64 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+sys.path.append(ROOT)
+
+from add_captions import load_batch_jobs
+
+
+class LoadBatchJobsTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def write_manifest(self, manifest):
+        path = os.path.join(self.tmp.name, "jobs.json")
+        with open(path, "w") as f:
+            json.dump(manifest, f)
+        return path
+
+    def test_directory_yields_one_job_per_audio_file(self):
+        for file_name in ["b.WAV", "a.mp3", "notes.txt", "c_captions.mp4"]:
+            open(os.path.join(self.tmp.name, file_name), "w").close()
+
+        self.assertEqual(load_batch_jobs(self.tmp.name), [
+            (os.path.join(self.tmp.name, "a.mp3"), os.path.join(self.tmp.name, "a_captions.mp4")),
+            (os.path.join(self.tmp.name, "b.WAV"), os.path.join(self.tmp.name, "b_captions.mp4")),
+        ])
+
+    def test_manifest_accepts_pairs_and_objects(self):
+        path = self.write_manifest([
+            ["one.mp3", "one.mp4"],
+            {"audio_path": "two.wav", "output_path": "out/two.mp4"},
+        ])
+        self.assertEqual(load_batch_jobs(path), [("one.mp3", "one.mp4"), ("two.wav", "out/two.mp4")])
+
+    def test_manifest_rejects_malformed_entries(self):
+        for manifest in [
+            {"audio_path": "one.mp3", "output_path": "one.mp4"},
+            ["one.mp3", "one.mp4"],
+            [["one.mp3"]],
+            [["one.mp3", "one.mp4", "extra.mp4"]],
+            [{"audio_path": "one.mp3"}],
+            [["one.mp3", None]],
+            [["one.mp3", ""]],
+        ]:
+            with self.subTest(manifest=manifest):
+                with self.assertRaises(ValueError):
+                    load_batch_jobs(self.write_manifest(manifest))
+
+    def test_cli_reports_a_bad_manifest(self):
+        path = self.write_manifest([["only_audio.mp3"]])
+        result = subprocess.run([sys.executable, os.path.join(ROOT, "add_captions.py"), "--batch", path],
+                                capture_output=True, text=True)
+        self.assertEqual(result.returncode, 2)
+        self.assertIn("entry 0 must be an [audio_path, output_path] pair", result.stderr)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import importlib.util
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+if importlib.util.find_spec("gradio") is not None:
+    import app
+
+
+@unittest.skipIf(importlib.util.find_spec("gradio") is None, "gradio is not installed")
+class ProcessedAudioCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.editor = app.UltimateShortEditor()
+        self.calls = []
+
+    def audio(self, name, content):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, "wb") as f:
+            f.write(content)
+        return path
+
+    def fake_process_audio(self, audio_file, silence_seconds):
+        self.calls.append((audio_file, silence_seconds))
+        output_file = os.path.join(self.tmp.name, f"cleaned_{len(self.calls)}.wav")
+        open(output_file, "wb").close()
+        return output_file, output_file, f"processed {len(self.calls)}"
+
+    def process(self, audio_file, silence_seconds=0.05):
+        with mock.patch.object(app, "_process_audio_in_worker", self.fake_process_audio):
+            return self.editor.process_audio_simple(audio_file, silence_seconds)
+
+    def test_hit_and_miss(self):
+        first = self.audio("first.wav", b"first")
+        output, _, _ = self.process(first)
+
+        # Same content under another name and the same setting: a hit
+        self.editor.auto_captions = ["kept"]
+        self.assertEqual(self.process(self.audio("copy.wav", b"first"))[0], output)
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(self.editor.auto_captions, ["kept"])
+
+        # Another setting or other content: a miss, and the old captions go
+        self.process(first, 0.2)
+        self.process(self.audio("second.wav", b"second"))
+        self.assertEqual(len(self.calls), 3)
+        self.assertIsNone(self.editor.auto_captions)
+
+    def test_missing_output_is_processed_again(self):
+        first = self.audio("first.wav", b"first")
+        output, _, _ = self.process(first)
+        os.remove(output)
+
+        # The stale entry is dropped even when processing it again fails
+        with mock.patch.object(app, "_process_audio_in_worker", side_effect=RuntimeError("worker failed")):
+            self.editor.process_audio_simple(first, 0.05)
+        self.assertEqual(len(self.editor._processed_audio_cache), 0)
+
+        self.assertNotEqual(self.process(first)[0], output)
+        self.assertEqual(len(self.calls), 2)
+        self.assertEqual(len(self.editor._processed_audio_cache), 1)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        size = app.PROCESSED_AUDIO_CACHE_SIZE
+        files = [self.audio(f"{i}.wav", str(i).encode()) for i in range(size + 1)]
+        for audio_file in files[:size]:
+            self.process(audio_file)
+        # Touch the oldest entry so the second one becomes the least recently used
+        self.process(files[0])
+        self.process(files[size])
+        self.assertEqual(len(self.calls), size + 1)
+        self.assertEqual(len(self.editor._processed_audio_cache), size)
+
+        self.process(files[0])
+        self.assertEqual(len(self.calls), size + 1)
+        self.process(files[1])
+        self.assertEqual(len(self.calls), size + 2)
+
+
+@unittest.skipIf(importlib.util.find_spec("gradio") is None, "gradio is not installed")
+class RemoveOverlayTest(unittest.TestCase):
+    def test_missing_id_keeps_the_list(self):
+        editor = app.UltimateShortEditor()
+        editor.images_data[1] = {"id": 1, "path": "logo.png", "start_time": 0, "end_time": 2}
+        editor.texts_data[1] = {"id": 1, "content": "hello", "start_time": 0, "end_time": 2}
+
+        self.assertIn("logo.png", editor.remove_image(None))
+        self.assertIn("hello", editor.remove_text(None))
+        self.assertEqual((len(editor.images_data), len(editor.texts_data)), (1, 1))
+
+        self.assertEqual(editor.remove_image(1.0), "No images added yet")
+        self.assertEqual(editor.remove_text(1.0), "No texts added yet")
+
+
+if __name__ == "__main__":
+    unittest.main()
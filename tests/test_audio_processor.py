@@ -0,0 +1,92 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from pydub import AudioSegment, silence
+from pydub.generators import Sine, WhiteNoise
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from utilities.audio_processor import _remove_silence_from_segment, detect_nonsilent, process_audio, split_on_silence
+
+
+def tone(ms, frame_rate=44100):
+    return Sine(440, sample_rate=frame_rate).to_audio_segment(ms, volume=-10).set_channels(2)
+
+
+def quiet(ms, frame_rate=44100):
+    # Low noise floor rather than digital zero, below the -45 dBFS threshold used by the editor
+    return WhiteNoise(sample_rate=frame_rate).to_audio_segment(ms, volume=-60).set_channels(2)
+
+
+CASES = {
+    "speech with gaps": tone(400) + quiet(300) + tone(250) + quiet(90) + tone(300) + quiet(150) + tone(200),
+    "leading and trailing silence": quiet(350) + tone(300) + quiet(200) + tone(300) + quiet(400),
+    "all silent": quiet(800),
+    "shorter than min_silence_len": quiet(40) + tone(30) + quiet(20),
+    "only sound": tone(500),
+    "odd frame rate": quiet(120) + tone(333, frame_rate=22050).set_channels(2) + quiet(250, frame_rate=22050),
+}
+
+
+class SilenceDetectionTest(unittest.TestCase):
+    """The NumPy silence helpers must keep exactly what pydub.silence keeps"""
+
+    def test_detect_nonsilent_matches_pydub(self):
+        for name, sound in CASES.items():
+            for min_silence_len, silence_thresh in [(100, -45), (50, -30), (1000, -16)]:
+                with self.subTest(name, min_silence_len=min_silence_len, silence_thresh=silence_thresh):
+                    self.assertEqual(
+                        detect_nonsilent(sound, min_silence_len, silence_thresh),
+                        silence.detect_nonsilent(sound, min_silence_len, silence_thresh),
+                    )
+
+    def test_split_on_silence_matches_pydub(self):
+        for name, sound in CASES.items():
+            for keep_silence in [0, 50, 200]:
+                with self.subTest(name, keep_silence=keep_silence):
+                    expected = silence.split_on_silence(
+                        sound, min_silence_len=100, silence_thresh=-45, keep_silence=keep_silence)
+                    result = split_on_silence(sound, min_silence_len=100, silence_thresh=-45, keep_silence=keep_silence)
+                    self.assertEqual([chunk.raw_data for chunk in result], [chunk.raw_data for chunk in expected])
+
+    def test_remove_silence_matches_joined_pydub_chunks(self):
+        for name, sound in CASES.items():
+            for minimum_silence in [0, 50, 200]:
+                with self.subTest(name, minimum_silence=minimum_silence):
+                    # What remove_silence used to do: pydub's chunks added back together
+                    expected = AudioSegment.empty()
+                    for chunk in silence.split_on_silence(
+                            sound, min_silence_len=100, silence_thresh=-45, keep_silence=minimum_silence):
+                        expected += chunk
+                    result = _remove_silence_from_segment(sound, minimum_silence)
+                    self.assertEqual(result.raw_data, expected.raw_data)
+                    self.assertEqual((result.frame_rate, result.channels), (sound.frame_rate, sound.channels))
+
+
+class ProcessAudioFormatTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_wav_stays_wav(self):
+        source = os.path.join(self.tmp.name, "voice take.wav")
+        CASES["speech with gaps"].export(source, format="wav")
+        output, _, text = process_audio(source)
+        self.assertTrue(output.endswith(".wav"))
+        self.assertIn("Old Duration: 1.690 seconds", text)
+        self.assertEqual(AudioSegment.from_wav(output).raw_data, _remove_silence_from_segment(CASES["speech with gaps"]).raw_data)
+
+    @unittest.skipIf(shutil.which("ffmpeg") is None or shutil.which("ffprobe") is None, "ffmpeg is not installed")
+    def test_mp3_stays_mp3(self):
+        source = os.path.join(self.tmp.name, "voice.mp3")
+        CASES["speech with gaps"].export(source, format="mp3")
+        output, _, _ = process_audio(source)
+        self.assertTrue(output.endswith(".mp3"))
+        self.assertEqual(AudioSegment.from_file(output).frame_rate, 44100)
+
+
+if __name__ == "__main__":
+    unittest.main()
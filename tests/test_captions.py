@@ -0,0 +1,81 @@
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+from moviepy import CompositeVideoClip, TextClip, VideoClip
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from utilities.video_processor import _ass_color, _ass_timestamp, add_captions, write_ass_captions
+
+FONT = os.path.join(os.path.dirname(__file__), "..", "static", "Utendo-Regular.ttf")
+
+
+class OverlappingCaptionsTest(unittest.TestCase):
+    def test_overlapping_captions_stack_like_separate_layers(self):
+        size = (360, 640)
+        background = np.random.default_rng(0).integers(0, 256, (size[1], size[0], 3), dtype=np.uint8)
+        video = VideoClip(lambda t: background, duration=4).with_fps(10)
+
+        # A long caption with a shorter one starting and ending inside it, plus a third overlapping both
+        texts = ["LONG CAPTION", "SHORT", "THIRD"]
+        start_times = [0.0, 1.0, 1.5]
+        durations = [3.5, 1.0, 1.5]
+
+        # Reference: one full-frame text clip per caption, composited in order
+        reference = CompositeVideoClip([video] + [
+            TextClip(
+                text=text, font_size=40, color="white", method="caption", size=size,
+                text_align="center", stroke_color="black", stroke_width=15,
+                vertical_align="center", font=FONT,
+            ).with_start(start).with_duration(duration)
+            for text, start, duration in zip(texts, start_times, durations)
+        ])
+        result = add_captions(video, texts, start_times, durations, font_size=40, font=FONT)
+
+        # Before, inside and after the shorter captions, including after one ends while the long one is active
+        for t in [0.5, 1.2, 1.7, 2.2, 2.7, 3.2, 3.7]:
+            np.testing.assert_array_equal(result.get_frame(t), reference.get_frame(t), err_msg=f"t={t}")
+
+
+class AssCaptionsTest(unittest.TestCase):
+    def test_timestamps_round_to_centiseconds(self):
+        self.assertEqual(_ass_timestamp(0), "0:00:00.00")
+        self.assertEqual(_ass_timestamp(-1.0), "0:00:00.00")
+        self.assertEqual(_ass_timestamp(1.234), "0:00:01.23")
+        self.assertEqual(_ass_timestamp(1.236), "0:00:01.24")
+        # Rounding up carries into the seconds, minutes and hours
+        self.assertEqual(_ass_timestamp(1.995), "0:00:02.00")
+        self.assertEqual(_ass_timestamp(59.995), "0:01:00.00")
+        self.assertEqual(_ass_timestamp(3599.999), "1:00:00.00")
+        self.assertEqual(_ass_timestamp(3723.45), "1:02:03.45")
+
+    def test_colors_are_written_as_bgr(self):
+        self.assertEqual(_ass_color("white"), "&H00FFFFFF")
+        self.assertEqual(_ass_color("red"), "&H000000FF")
+        self.assertEqual(_ass_color("#123456"), "&H00563412")
+
+    def test_dialogue_text_is_escaped(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "captions.ass")
+            write_ass_captions(
+                path,
+                ["{\\b1}bold?", "back\\slash\\N", "two\nlines", "  ", "skipped"],
+                [0.0, 1.0, 2.0, 3.0, 4.0],
+                [1.0, 1.0, 1.995, 1.0, 0.0],
+                font=FONT,
+            )
+            with open(path, encoding="utf-8") as f:
+                dialogue = [line for line in f.read().splitlines() if line.startswith("Dialogue:")]
+
+        self.assertEqual(dialogue, [
+            "Dialogue: 0,0:00:00.00,0:00:01.00,Default,,0,0,0,,(/b1)bold?",
+            "Dialogue: 0,0:00:01.00,0:00:02.00,Default,,0,0,0,,back/slash/N",
+            "Dialogue: 0,0:00:02.00,0:00:04.00,Default,,0,0,0,,two\\Nlines",
+        ])
+
+
+if __name__ == "__main__":
+    unittest.main()
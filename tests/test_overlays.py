@@ -0,0 +1,94 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+from moviepy import CompositeVideoClip, ImageClip, TextClip, VideoClip
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from utilities.video_processor import add_heading, add_smaller_captions
+
+STATIC = os.path.join(os.path.dirname(__file__), "..", "static")
+SIZE = (360, 640)
+
+
+def make_video(masked):
+    background = np.random.default_rng(1).integers(0, 256, (SIZE[1], SIZE[0], 3), dtype=np.uint8)
+    video = VideoClip(lambda t: background, duration=4).with_fps(10)
+    if masked:
+        # Partly transparent base, as when the edit is itself layered over something else
+        alpha = np.tile(np.linspace(0.2, 1.0, SIZE[0]), (SIZE[1], 1))
+        video = video.with_mask(VideoClip(lambda t: alpha, is_mask=True, duration=4))
+    return video
+
+
+def layered_heading(video, text, font, font_size, stroke_width=8, padding_top=25):
+    """add_heading as it was: a TextClip layered over the video"""
+    max_text_width = int(video.w * 0.9 - 2 * 25)
+    heading = TextClip(
+        text=text, font_size=font_size, color="white", method="caption", size=(max_text_width, None),
+        text_align="center", stroke_color="black", stroke_width=stroke_width, font=font,
+    ).with_duration(video.duration)
+    return CompositeVideoClip([video, heading.with_position(((video.w - heading.w) // 2, padding_top))])
+
+
+def layered_smaller_captions(video, texts, start_times, end_times, font, bg_opacity=0.7,
+                             padding_bottom=60, bg_padding=15):
+    """add_smaller_captions as it was: a background ImageClip and a TextClip per caption"""
+    clips = [video]
+    for text, start_time, end_time in zip(texts, start_times, end_times):
+        duration = end_time - start_time
+        text_clip = TextClip(
+            text=text, font_size=40, color="white", method="caption", size=(video.w - 2 * 40, None),
+            text_align="center", font=font,
+        ).with_duration(duration).with_start(start_time)
+        bg_width, bg_height = text_clip.w + 2 * bg_padding, text_clip.h + 2 * bg_padding
+        bg_x, bg_y = (video.w - bg_width) // 2, video.h - padding_bottom - bg_height
+        bg_clip = (ImageClip(np.zeros((bg_height, bg_width, 3), dtype=np.uint8))
+                   .with_duration(duration).with_start(start_time).with_opacity(bg_opacity))
+        clips.append(bg_clip.with_position((bg_x, bg_y)))
+        clips.append(text_clip.with_position(((video.w - text_clip.w) // 2, bg_y + bg_padding)))
+    return CompositeVideoClip(clips)
+
+
+class OverlayFramesTest(unittest.TestCase):
+    """The single-layer overlays must look like the layered composites they replaced"""
+
+    def assert_same_frames(self, video, result, reference, times, atol):
+        for t in times:
+            np.testing.assert_allclose(
+                result.get_frame(t).astype(int), reference.get_frame(t).astype(int), atol=atol, err_msg=f"t={t}")
+            if video.mask is None:
+                # An opaque base stays opaque instead of gaining an all-ones mask
+                self.assertIsNone(result.mask)
+            else:
+                np.testing.assert_allclose(
+                    result.mask.get_frame(t), reference.mask.get_frame(t), atol=1e-6, err_msg=f"mask t={t}")
+
+    def test_heading(self):
+        font = os.path.join(STATIC, "Utendo-Bold.ttf")
+        for masked in [False, True]:
+            with self.subTest(masked=masked):
+                video = make_video(masked)
+                result = add_heading(video, "A HEADING THAT WRAPS", font_size=40, font=font)
+                reference = layered_heading(video, "A HEADING THAT WRAPS", font, font_size=40)
+                self.assert_same_frames(video, result, reference, [0.0, 1.5, 3.9], atol=0)
+
+    def test_smaller_captions(self):
+        font = os.path.join(STATIC, "Utendo-Regular.ttf")
+        texts = ["first caption", "a second, longer caption that wraps", "third"]
+        start_times = [0.0, 1.0, 2.5]
+        end_times = [1.0, 2.5, 3.5]
+        for masked in [False, True]:
+            with self.subTest(masked=masked):
+                video = make_video(masked)
+                result = add_smaller_captions(video, texts, start_times, end_times, font=font)
+                reference = layered_smaller_captions(video, texts, start_times, end_times, font)
+                # The background and text are blended into one layer ahead of time,
+                # so antialiased edges may differ from the two rounded blends by a level or two
+                self.assert_same_frames(video, result, reference, [0.5, 1.7, 2.9, 3.8], atol=2)
+
+
+if __name__ == "__main__":
+    unittest.main()